@@ -0,0 +1,160 @@
+import hashlib
+import mmap
+import operator
+import os
+import threading
+from collections import OrderedDict
+from itertools import accumulate, repeat
+
+ANALYSIS_CACHE_SIZE = 128
+
+# Rough characters-per-token ratio used for LLM token estimates
+CHARS_PER_TOKEN = 4
+
+# Sources are scanned in blocks of about this many characters (or bytes)
+SCAN_BLOCK_SIZE = 1 << 20
+
+COMMENT_PREFIXES = ('#', '//', '/*', '*', '--')
+BLOCK_COMMENT_DELIMITERS = (('/*', '*/'), ('--[[', ']]'))
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _iter_blocks(source, newline):
+    """Yield consecutive slices of source that end on a line break"""
+    start, size = 0, len(source)
+    while start < size:
+        end = min(start + SCAN_BLOCK_SIZE, size)
+        if end < size:
+            cut = source.rfind(newline, start, end)
+            end = cut + 1 if cut >= start else end
+        yield source[start:end]
+        start = end
+
+
+def _content_key(source):
+    data = source.encode("utf-8", errors="surrogatepass") if isinstance(source, str) else source
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _scan(source):
+    if isinstance(source, str):
+        newline, empty, open_brace, close_brace = '\n', '', '{', '}'
+        prefixes, delimiters = COMMENT_PREFIXES, BLOCK_COMMENT_DELIMITERS
+    else:
+        newline, empty, open_brace, close_brace = b'\n', b'', b'{', b'}'
+        prefixes = tuple(prefix.encode() for prefix in COMMENT_PREFIXES)
+        delimiters = tuple((start.encode(), end.encode()) for start, end in BLOCK_COMMENT_DELIMITERS)
+
+    total_lines = 1
+    blank_lines = comment_lines = 0
+    brace_depth = max_brace_depth = 0
+    indent_widths = set()
+    block_comment_spans = []
+    open_comment = None
+
+    for block in _iter_blocks(source, newline):
+        kind = type(block)
+        block_start_line = total_lines
+        total_lines += block.count(newline)
+        lines = block.split(newline)
+        if block.endswith(newline):
+            lines.pop()
+
+        # Per-line work is done with map() so the loops run in C
+        stripped = list(map(kind.strip, lines))
+        blank_lines += stripped.count(empty)
+        comment_lines += list(map(kind.startswith, stripped, repeat(prefixes))).count(True)
+        indent_widths.update(map(operator.sub, map(len, lines), map(len, map(kind.lstrip, lines))))
+
+        # Brace depth is tracked at line granularity
+        depths = list(accumulate(
+            map(operator.sub, map(kind.count, lines, repeat(open_brace)), map(kind.count, lines, repeat(close_brace))),
+            initial=brace_depth
+        ))
+        max_brace_depth = max(max_brace_depth, max(depths))
+        brace_depth = max(depths[-1], 0)
+
+        position = counted_to = 0
+        line = block_start_line
+        next_openers = {}
+        while True:
+            if open_comment is None:
+                # Remember where each opener occurs next so the block is not rescanned per comment
+                for opener, _ in delimiters:
+                    found_at = next_openers.get(opener)
+                    if found_at is None or 0 <= found_at < position:
+                        next_openers[opener] = block.find(opener, position)
+                found = [(next_openers[opener], opener, closer) for opener, closer in delimiters if next_openers[opener] >= 0]
+                if not found:
+                    break
+                comment_start, opener, closer = min(found)
+                line += block.count(newline, counted_to, comment_start)
+                counted_to = comment_start
+                open_comment = (line, closer)
+                position = comment_start + len(opener)
+            comment_end = block.find(open_comment[1], position)
+            if comment_end < 0:
+                break
+            position = comment_end + len(open_comment[1])
+            line += block.count(newline, counted_to, position)
+            counted_to = position
+            block_comment_spans.append((open_comment[0], line))
+            open_comment = None
+
+    # A source ending in a newline has a final empty line, as with str.split
+    if source[-1:] == newline:
+        blank_lines += 1
+    non_empty_lines = total_lines - blank_lines
+    indent_widths.discard(0)
+    indent_unit = min(indent_widths) if indent_widths else 0
+    max_indent_depth = max(indent_widths) // indent_unit if indent_unit else 0
+
+    return {
+        "total_lines": total_lines,
+        "non_empty_lines": non_empty_lines,
+        "comment_lines": comment_lines,
+        "code_lines": non_empty_lines - comment_lines,
+        "comment_ratio": comment_lines / non_empty_lines if non_empty_lines > 0 else 0,
+        "total_chars": len(source),
+        "block_comments": len(block_comment_spans),
+        "block_comment_spans": block_comment_spans,
+        "max_nesting_depth": max(max_brace_depth, max_indent_depth),
+        "approx_tokens": -(-len(source) // CHARS_PER_TOKEN),
+    }
+
+
+def analyze_code_complexity(code):
+    """Line, comment, nesting and token metrics for a str, bytes or memory-mapped buffer
+
+    The source is scanned once in fixed-size blocks, so at most one block's lines are
+    held at a time. Results are memoized by content hash.
+    """
+    if not code:
+        return {
+            "total_lines": 0, "non_empty_lines": 0, "comment_lines": 0, "code_lines": 0, "comment_ratio": 0,
+            "total_chars": 0, "block_comments": 0, "block_comment_spans": [], "max_nesting_depth": 0,
+            "approx_tokens": 0
+        }
+
+    key = _content_key(code)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return dict(_cache[key])
+
+    result = _scan(code)
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > ANALYSIS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(result)
+
+
+def analyze_file(path):
+    """Analyze a file through a read-only memory map"""
+    if os.path.getsize(path) == 0:
+        return analyze_code_complexity("")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return analyze_code_complexity(mapped)
@@ -1,16 +1,22 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage
+from startup import lazy_import, mark, import_report
 from dotenv import load_dotenv
-from langchain_core.output_parsers import StrOutputParser
+import functools
 import os
+import re
 import streamlit as st
-import pandas as pd
 import time
-import json
-import pyperclip
-from datetime import datetime
-import base64
+from batch import iter_batch_conversions, write_results_zip, DEFAULT_BATCH_WORKERS
+from engine import ConversionEngine, ConversionOptions, create_router, create_cache, make_history_item, get_chunk_max_lines
+from history import HistoryStore, DEFAULT_HISTORY_DB, DEFAULT_MAX_PER_SESSION, DEFAULT_MAX_TOTAL
+from metrics import MetricsRegistry, DEFAULT_METRICS_FILE, DEFAULT_EXPORT_INTERVAL, add_timing
+from jobs import JobQueue, QUEUED, RUNNING, DONE, FAILED
+import uuid
+from detection import detect_language, detect_language_with_confidence
+from analysis import analyze_code_complexity
+from templates import CODE_TEMPLATES
+from translation_pack import load_pack
+from report import build_report, expand_uploads, summarize_report
+from profiling import Profiler, slowest_functions
 
 load_dotenv()
 
@@ -23,215 +29,72 @@ st.set_page_config(
 )
 
 # Enhanced Custom CSS for beautiful UI
-st.markdown("""
-<style>
-    /* Main Styles */
-    .main-header {
-        font-size: 3.5rem;
-        background: linear-gradient(45deg, #FF6B6B, #4ECDC4, #45B7D1, #96CEB4, #FFE66D);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        text-align: center;
-        margin-bottom: 0.5rem;
-        font-weight: 800;
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-    }
-    
-    .sub-header {
-        text-align: center;
-        color: #666;
-        margin-bottom: 2rem;
-        font-size: 1.2rem;
-    }
-    
-    /* Glassmorphism Cards */
-    .converter-card {
-        background: rgba(255, 255, 255, 0.1);
-        backdrop-filter: blur(10px);
-        border-radius: 20px;
-        padding: 25px;
-        margin: 15px 0;
-        color: white;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        box-shadow: 0 8px 32px rgba(0,0,0,0.1);
-    }
-    
-    .input-card {
-        background: linear-gradient(135deg, rgba(255, 107, 107, 0.15), rgba(78, 205, 196, 0.15));
-        backdrop-filter: blur(10px);
-        border-radius: 15px;
-        padding: 20px;
-        margin: 10px 0;
-        color: white;
-        border: 1px solid rgba(255, 255, 255, 0.15);
-    }
-    
-    .output-card {
-        background: linear-gradient(135deg, rgba(79, 172, 254, 0.15), rgba(0, 242, 254, 0.15));
-        backdrop-filter: blur(10px);
-        border-radius: 15px;
-        padding: 20px;
-        margin: 10px 0;
-        color: white;
-        border: 1px solid rgba(255, 255, 255, 0.15);
-    }
-    
-    .stats-card {
-        background: rgba(255, 255, 255, 0.1);
-        border-radius: 15px;
-        padding: 20px;
-        margin: 10px 0;
-        text-align: center;
-        color: white;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-    }
-    
-    /* Language Tags */
-    .language-tag {
-        background: rgba(255,255,255,0.15);
-        padding: 8px 16px;
-        border-radius: 20px;
-        margin: 4px;
-        display: inline-block;
-        font-weight: 600;
-        font-size: 0.8rem;
-        border: 1px solid rgba(255,255,255,0.1);
-    }
-    
-    /* Buttons */
-    .convert-btn {
-        background: linear-gradient(45deg, #FF6B6B, #4ECDC4);
-        color: white;
-        border: none;
-        border-radius: 25px;
-        padding: 15px 40px;
-        font-size: 1.1rem;
-        font-weight: bold;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        width: 100%;
-        margin: 20px 0;
-        box-shadow: 0 5px 15px rgba(255, 107, 107, 0.3);
-    }
-    
-    .convert-btn:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 8px 25px rgba(255, 107, 107, 0.4);
-    }
-    
-    .action-btn {
-        background: rgba(255,255,255,0.15);
-        color: white;
-        border: 1px solid rgba(255,255,255,0.2);
-        border-radius: 15px;
-        padding: 10px 20px;
-        margin: 5px;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        font-weight: 600;
-        font-size: 0.8rem;
-    }
-    
-    .action-btn:hover {
-        background: rgba(255,255,255,0.25);
-        transform: translateY(-1px);
-    }
-    
-    /* History Items */
-    .history-item {
-        background: rgba(255,255,255,0.08);
-        border-radius: 12px;
-        padding: 15px;
-        margin: 8px 0;
-        border-left: 4px solid #4ECDC4;
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
-    
-    .history-item:hover {
-        background: rgba(255,255,255,0.15);
-        transform: translateX(5px);
-    }
-    
-    /* Code Blocks */
-    .code-block {
-        background: #1e1e1e;
-        border-radius: 10px;
-        padding: 20px;
-        margin: 15px 0;
-        font-family: 'Courier New', monospace;
-        color: #f8f8f2;
-        border: 2px solid #333;
-        max-height: 400px;
-        overflow-y: auto;
-    }
-    
-    .feature-card {
-        background: rgba(255,255,255,0.08);
-        border-radius: 15px;
-        padding: 20px;
-        margin: 8px;
-        text-align: center;
-        transition: all 0.3s ease;
-        border: 1px solid rgba(255,255,255,0.1);
-        height: 100%;
-    }
-    
-    .feature-card:hover {
-        transform: translateY(-3px);
-        background: rgba(255,255,255,0.12);
-    }
-    
-    /* Custom Scrollbar */
-    ::-webkit-scrollbar {
-        width: 6px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: rgba(255,255,255,0.1);
-        border-radius: 10px;
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: linear-gradient(45deg, #FF6B6B, #4ECDC4);
-        border-radius: 10px;
-    }
-    
-    /* Fix Streamlit container spacing */
-    .block-container {
-        padding-top: 2rem;
-        padding-bottom: 2rem;
-    }
-    
-    /* Sidebar improvements */
-    .css-1d391kg {
-        padding-top: 2rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def load_styles():
+    """Read and minify the stylesheet once per process"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "styles.css")) as f:
+        css = f.read()
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", re.sub(r"\s+", " ", css))
+    return f"<style>{css.strip()}</style>"
+
+st.markdown(load_styles(), unsafe_allow_html=True)
 
 # Initialize session state
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Metadata only; input/output bodies live in the history store
 if 'conversion_history' not in st.session_state:
     st.session_state.conversion_history = []
 
+if 'history_page' not in st.session_state:
+    st.session_state.history_page = 0
+
 if 'total_conversions' not in st.session_state:
     st.session_state.total_conversions = 0
 
 if 'favorite_conversions' not in st.session_state:
     st.session_state.favorite_conversions = []
 
-if 'current_code_input' not in st.session_state:
-    st.session_state.current_code_input = ""
+# Editor and language selections are keyed by their widgets so callbacks can update them
+if 'code_input_main' not in st.session_state:
+    st.session_state.code_input_main = ""
+
+if 'source_lang_select' not in st.session_state:
+    st.session_state.source_lang_select = "python"
 
-if 'current_source_lang' not in st.session_state:
-    st.session_state.current_source_lang = "python"
+if 'target_lang_select' not in st.session_state:
+    st.session_state.target_lang_select = "javascript"
 
-if 'current_target_lang' not in st.session_state:
-    st.session_state.current_target_lang = "javascript"
+# Detection and analysis of the last analysed editor text
+if 'input_insights' not in st.session_state:
+    st.session_state.input_insights = None
+
+# The latest conversion, one entry per target, rendered from state so it survives reruns
+if 'last_conversions' not in st.session_state:
+    st.session_state.last_conversions = []
 
 if 'converted_code' not in st.session_state:
     st.session_state.converted_code = ""
 
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = []
+
+if 'batch_zip' not in st.session_state:
+    st.session_state.batch_zip = None
+
+# Background jobs submitted by this session, and those already added to its history
+if 'job_ids' not in st.session_state:
+    st.session_state.job_ids = []
+
+if 'collected_jobs' not in st.session_state:
+    st.session_state.collected_jobs = set()
+
+# Planning report of the uploaded files: (uploads key, report frame)
+if 'upload_report' not in st.session_state:
+    st.session_state.upload_report = None
+
 # Programming languages with icons
 LANGUAGES = {
     "python": {"icon": "🐍", "name": "Python", "color": "#3776AB"},
@@ -259,31 +122,6 @@ def get_language_display(lang_key):
     lang = LANGUAGES.get(lang_key, {"icon": "❓", "name": lang_key, "color": "#666"})
     return f"{lang['icon']} {lang['name']}"
 
-def detect_language(code):
-    """Simple code language detection"""
-    if not code or not code.strip():
-        return "unknown"
-        
-    code_lower = code.lower().strip()
-    
-    detection_patterns = {
-        'python': ['def ', 'import ', 'print(', 'elif ', 'lambda ', 'from ', 'numpy', 'pandas'],
-        'javascript': ['function ', 'const ', 'let ', 'var ', '=>', 'console.log', 'document.', 'ajax'],
-        'java': ['public class', 'void main', 'System.out', 'import java', 'String[] args'],
-        'c++': ['#include <iostream>', 'using namespace', 'std::', 'cout <<', 'cin >>'],
-        'c': ['#include <stdio.h>', 'printf(', 'scanf(', '#include "', 'int main('],
-        'php': ['<?php', '$', 'echo ', 'function ', '$_GET', '$_POST'],
-        'go': ['package main', 'import "', 'func main()', 'fmt.Print', 'go func'],
-        'rust': ['fn main()', 'let ', 'println!', 'use std::', 'mut ', 'Vec::'],
-        'typescript': ['interface ', 'type ', ': string', ': number', 'export const']
-    }
-    
-    for lang, patterns in detection_patterns.items():
-        if any(pattern in code_lower for pattern in patterns):
-            return lang
-    
-    return "unknown"
-
 def get_language_info(language):
     """Get information about programming languages"""
     language_info = {
@@ -302,274 +140,476 @@ def get_language_info(language):
 def copy_to_clipboard(text):
     """Copy text to clipboard"""
     try:
-        pyperclip.copy(text)
+        lazy_import("pyperclip").copy(text)
         return True
     except:
         return False
 
-def analyze_code_complexity(code):
-    """Simple code complexity analysis"""
-    if not code:
-        return {"total_lines": 0, "non_empty_lines": 0, "comment_lines": 0, "code_lines": 0, "comment_ratio": 0}
-        
-    lines = code.split('\n')
-    total_lines = len(lines)
-    non_empty_lines = len([line for line in lines if line.strip()])
-    comment_lines = len([line for line in lines if line.strip().startswith(('#', '//', '/*', '*', '--'))])
-    
-    return {
-        "total_lines": total_lines,
-        "non_empty_lines": non_empty_lines,
-        "comment_lines": comment_lines,
-        "code_lines": non_empty_lines - comment_lines,
-        "comment_ratio": comment_lines / non_empty_lines if non_empty_lines > 0 else 0
-    }
-
 def set_code_template(template_type):
     """Set code templates"""
-    templates = {
-        "python": """def fibonacci(n):
-    # Calculate Fibonacci sequence
-    if n <= 1:
-        return n
-    else:
-        return fibonacci(n-1) + fibonacci(n-2)
+    return CODE_TEMPLATES.get(template_type, "")
 
-# Test the function
-for i in range(10):
-    print(f"Fibonacci({i}) = {fibonacci(i)}")""",
-        
-        "javascript": """function factorial(n) {
-    // Calculate factorial recursively
-    if (n === 0 || n === 1) {
-        return 1;
-    }
-    return n * factorial(n - 1);
-}
+# Streamed output is redrawn at most this often; each redraw sends the whole text so far
+STREAM_RENDER_INTERVAL = 0.1
 
-// Test the function
-for (let i = 0; i < 10; i++) {
-    console.log(`Factorial(${i}) = ${factorial(i)}`);
-}""",
-        
-        "java": """public class Calculator {
-    public static int add(int a, int b) {
-        return a + b;
-    }
-    
-    public static void main(String[] args) {
-        // Test addition
-        int result = add(5, 3);
-        System.out.println("5 + 3 = " + result);
-    }
-}"""
-    }
-    
-    return templates.get(template_type, "")
+def render_streamed_conversion(placeholder, chunks, language, timings):
+    """Render chunks into placeholder as they arrive; render and total time go into timings
+
+    Redraws are throttled to one per STREAM_RENDER_INTERVAL, so long outputs are not
+    re-sent for every chunk. The caller renders the final text.
+    """
+    start = time.perf_counter()
+    parts = []
+    rendered_at = None
+    for chunk in chunks:
+        parts.append(chunk)
+        render_start = time.perf_counter()
+        if rendered_at is not None and render_start - rendered_at < STREAM_RENDER_INTERVAL:
+            continue
+        placeholder.code("".join(parts), language=language)
+        rendered_at = time.perf_counter()
+        add_timing(timings, 'render', rendered_at - render_start)
+    timings['generation_time'] = time.perf_counter() - start
+    return "".join(parts)
+
+@st.cache_resource
+def get_conversion_cache():
+    """Process-wide conversion cache shared by every session"""
+    return create_cache()
+
+@st.cache_resource
+def get_profiler():
+    """Process-wide profiler; PROFILE=1 profiles every rerun and conversion, the sidebar toggle one session's"""
+    return Profiler.from_env()
+
+def profiling_requested():
+    """Whether this session turned on profiling in the sidebar"""
+    return st.session_state.get('profile_session', False)
+
+def profiled(fn):
+    """Profile a fragment's own reruns; during a full rerun it is part of the rerun's profile"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with get_profiler().run(f"fragment-{fn.__name__}", enabled=profiling_requested()):
+            return fn(*args, **kwargs)
+    return wrapper
+
+@st.cache_resource
+def get_engine():
+    """Process-wide conversion engine; the model client and its connection pool are created once"""
+    return ConversionEngine(router=create_router(), cache=get_conversion_cache(), pack=load_pack(), profiler=get_profiler())
+
+@st.cache_resource
+def get_metrics_registry():
+    """Process-wide conversion metrics, exported in Prometheus text format"""
+    registry = MetricsRegistry(
+        export_path=os.getenv("METRICS_FILE", DEFAULT_METRICS_FILE),
+        export_interval=float(os.getenv("METRICS_EXPORT_INTERVAL", DEFAULT_EXPORT_INTERVAL)),
+    )
+    if os.getenv("METRICS_PORT"):
+        registry.serve(int(os.getenv("METRICS_PORT")))
+    return registry
+
+@st.cache_resource
+def get_job_queue():
+    """Process-wide background conversion pool; its queue depth is exported with the metrics"""
+    queue = JobQueue(get_engine())
+    registry = get_metrics_registry()
+    registry.register_gauge("code_converter_jobs_queued", "Background conversions waiting for a worker",
+                            lambda: queue.stats()['queued'])
+    registry.register_gauge("code_converter_jobs_running", "Background conversions in progress",
+                            lambda: queue.stats()['running'])
+    return queue
+
+PROFILE_VIEWER_RUNS = 10
+
+JOB_POLL_SECONDS = 1.0
+JOB_STATUS_ICONS = {QUEUED: "🕓", RUNNING: "⚙️", DONE: "✅", FAILED: "❌"}
+
+HISTORY_PAGE_SIZE = 3
+
+@st.cache_resource
+def get_history_store():
+    """Process-wide history store shared by every session"""
+    return HistoryStore(
+        db_path=os.getenv("HISTORY_DB", DEFAULT_HISTORY_DB),
+        max_per_session=int(os.getenv("HISTORY_MAX_PER_SESSION", DEFAULT_MAX_PER_SESSION)),
+        max_total=int(os.getenv("HISTORY_MAX_TOTAL", DEFAULT_MAX_TOTAL))
+    )
+
+def record_history(item):
+    """Persist a history item and keep only its metadata in the session"""
+    store = get_history_store()
+    st.session_state.conversion_history.append(store.add(st.session_state.session_id, item))
+    del st.session_state.conversion_history[:-store.max_per_session]
+
+def load_code(code, source_lang=None, target_lang=None):
+    """Put code and languages into the editor widgets; used as a button callback"""
+    st.session_state.code_input_main = code
+    if source_lang:
+        st.session_state.source_lang_select = source_lang
+    if target_lang:
+        st.session_state.target_lang_select = target_lang
+    if st.session_state.target_lang_select == st.session_state.source_lang_select:
+        st.session_state.target_lang_select = next(lang for lang in LANGUAGES if lang != st.session_state.source_lang_select)
 
 def swap_languages():
     """Swap source and target languages"""
-    current_source = st.session_state.current_source_lang
-    current_target = st.session_state.current_target_lang
-    st.session_state.current_source_lang = current_target
-    st.session_state.current_target_lang = current_source
+    current_source = st.session_state.source_lang_select
+    current_target = st.session_state.target_lang_select
+    st.session_state.source_lang_select = current_target
+    st.session_state.target_lang_select = current_source
+    languages_changed()
 
-def main():
-    # Header
-    st.markdown('<h1 class="main-header">💻 Code Converter Pro</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="sub-header">Transform your code between 15+ programming languages with AI-powered precision</p>', unsafe_allow_html=True)
+def languages_changed():
+    """Widget callback: the languages changed, so rerun the whole app rather than only the settings fragment"""
+    st.session_state.languages_changed = True
+
+def start_new_conversion():
+    """Clear the editor and the last result"""
+    st.session_state.code_input_main = ""
+    st.session_state.last_conversions = []
+
+def get_input_insights(code):
+    """Detected language and analysis of the editor text, recomputed only when the text changes"""
+    insights = st.session_state.input_insights
+    if insights is None or insights[0] != code:
+        insights = (code, detect_language_with_confidence(code), analyze_code_complexity(code))
+        st.session_state.input_insights = insights
+    return insights[1], insights[2]
+
+def read_uploaded_files(uploaded_files):
+    """(name, text) pairs of the uploaded files, with zip archives expanded into their members"""
+    return list(expand_uploads((uploaded.name, uploaded.getvalue()) for uploaded in uploaded_files))
+
+def get_upload_report(uploaded_files, target_lang):
+    """Size and cost report of the uploaded files, rebuilt only when the uploads or target change"""
+    key = (tuple(uploaded.file_id for uploaded in uploaded_files), target_lang)
+    cached = st.session_state.upload_report
+    if cached is None or cached[0] != key:
+        frame = build_report(
+            read_uploaded_files(uploaded_files), target_lang, detect_language,
+            tokens_per_second=get_metrics_registry().output_tokens_per_second(),
+            chunk_lines=get_chunk_max_lines()
+        )
+        cached = (key, frame)
+        st.session_state.upload_report = cached
+    return cached[1]
+
+def render_upload_report(uploaded_files, target_lang):
+    """Per-file and per-language estimates for the uploaded files, before anything is converted"""
+    frame = get_upload_report(uploaded_files, target_lang)
+    summary, wall_seconds = summarize_report(frame, workers=int(os.getenv("BATCH_MAX_WORKERS", DEFAULT_BATCH_WORKERS)))
+    with st.expander(f"📊 Conversion plan: {len(frame)} files", expanded=True):
+        metric_cols = st.columns(5)
+        metric_cols[0].metric("Lines", f"{int(frame['total_lines'].sum()):,}")
+        metric_cols[1].metric("Code Lines", f"{int(frame['code_lines'].sum()):,}")
+        metric_cols[2].metric("Input Tokens", f"{int(frame['input_tokens'].sum()):,}")
+        metric_cols[3].metric("Output Tokens", f"{int(frame['output_tokens'].sum()):,}")
+        metric_cols[4].metric("Projected Time", f"{wall_seconds / 60:.1f} min")
+        st.caption(
+            f"Projected for {get_language_display(target_lang)}; files already in that language or in no known "
+            "language are not converted. Click a column header to sort."
+        )
+        st.dataframe(summary, use_container_width=True)
+        st.dataframe(
+            frame, use_container_width=True, hide_index=True,
+            column_config={"projected_seconds": st.column_config.NumberColumn("projected_seconds", format="%.1f")}
+        )
+
+def get_target_languages():
+    """Selected targets: the multiselect in fan-out mode, otherwise the target selectbox"""
+    if st.session_state.get("multi_target") and st.session_state.get("target_langs_select"):
+        return list(st.session_state.target_langs_select)
+    return [st.session_state.target_lang_select]
+
+def get_conversion_options():
+    """Conversion options from the settings widgets"""
+    return ConversionOptions(
+        st.session_state.optimization_level,
+        st.session_state.include_comments,
+        st.session_state.add_error_handling
+    )
+
+def render_sidebar():
+    """Stats, languages and history; runs only on full reruns, i.e. when history changes"""
+    st.markdown("### 📊 Conversion Stats")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f'<div class="stats-card">Total<br><h3>{st.session_state.total_conversions}</h3></div>', unsafe_allow_html=True)
+    with col2:
+        st.markdown(f'<div class="stats-card">History<br><h3>{len(st.session_state.conversion_history)}</h3></div>', unsafe_allow_html=True)
     
-    # Initialize model and parser
-    parser = StrOutputParser()
-    model = ChatGoogleGenerativeAI(
-        model='gemini-2.5-flash',
-        temperature=0
+    cache_stats = get_conversion_cache().stats()
+    st.caption(
+        f"⚡ Cache: {cache_stats['hits']} hits • {cache_stats['misses']} misses • "
+        f"{cache_stats['evictions']} evictions ({cache_stats['hit_ratio']:.0%} hit rate)"
     )
+    flight_stats = get_engine().flights.stats()
+    st.caption(f"🔗 Shared in-flight: {flight_stats['coalesced']} requests joined an identical running conversion")
+    call_stats = get_engine().router.stats()
+    st.caption(
+        f"🛡️ Model calls: breaker {call_stats['breaker']} • {call_stats['retries']} retries • "
+        f"{call_stats['timeouts']} timeouts • {call_stats['hedge_wins']}/{call_stats['hedges']} hedges won"
+    )
+    if len(call_stats['backends']) > 1:
+        st.caption(f"🔀 Backends ({call_stats['failovers']} failovers):  \n" + "  \n".join(
+            f"{backend['name']}: {backend['requests']} calls • {backend['seconds_per_1k_tokens']:.2f}s/1k tokens • "
+            f"{backend['error_rate']:.0%} errors • {backend['breaker']}"
+            for backend in call_stats['backends']
+        ))
+    
+    st.markdown("### 🌟 Supported Languages")
+    # Display languages in a compact grid
+    language_text = ""
+    for lang_key, lang_data in LANGUAGES.items():
+        language_text += f"{lang_data['icon']} {lang_data['name']}  \n"
+    st.markdown(language_text)
+    
+    st.markdown("---")
+    st.markdown("### 📚 Recent Conversions")
+    render_history_list()
+    
+    if st.button("🗑️ Clear History", use_container_width=True):
+        get_history_store().clear(st.session_state.session_id)
+        st.session_state.conversion_history = []
+        st.session_state.history_page = 0
+        st.session_state.total_conversions = 0
+        st.rerun()
+    
+    with st.expander("⏱️ Startup"):
+        report = import_report()
+        for event, seconds in report['events'].items():
+            st.caption(f"{event}: {seconds:.2f}s after start")
+        for module, seconds in sorted(report['imports'].items(), key=lambda item: -item[1]):
+            st.caption(f"import {module}: {seconds * 1000:.0f} ms")
+    
+    with st.expander("🔬 Profiling"):
+        render_profiles()
 
-    # Sidebar - Fixed layout
-    with st.sidebar:
-        st.markdown("### 📊 Conversion Stats")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown(f'<div class="stats-card">Total<br><h3>{st.session_state.total_conversions}</h3></div>', unsafe_allow_html=True)
-        with col2:
-            st.markdown(f'<div class="stats-card">History<br><h3>{len(st.session_state.conversion_history)}</h3></div>', unsafe_allow_html=True)
-        
-        st.markdown("### 🌟 Supported Languages")
-        # Display languages in a compact grid
-        language_text = ""
-        for lang_key, lang_data in LANGUAGES.items():
-            language_text += f"{lang_data['icon']} {lang_data['name']}  \n"
-        st.markdown(language_text)
-        
-        st.markdown("---")
-        st.markdown("### 📚 Recent Conversions")
-        
-        if st.session_state.conversion_history:
-            for i, item in enumerate(reversed(st.session_state.conversion_history[-3:])):
-                with st.container():
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.markdown(f"""
-                        **{LANGUAGES[item['from_lang']]['icon']} → {LANGUAGES[item['to_lang']]['icon']}**
-                        """)
-                        st.caption(f"{item['timestamp'].split(' ')[1]}")
-                    with col2:
-                        if st.button("↻", key=f"reload_{i}"):
-                            st.session_state.current_code_input = item['input']
-                            st.session_state.current_source_lang = item['from_lang']
-                            st.session_state.current_target_lang = item['to_lang']
-                            st.rerun()
-        else:
-            st.info("No conversions yet")
-        
-        if st.button("🗑️ Clear History", use_container_width=True):
-            st.session_state.conversion_history = []
-            st.session_state.total_conversions = 0
-            st.rerun()
+def render_profiles():
+    """Profiling toggle and the slowest functions and allocation sites of the last runs"""
+    profiler = get_profiler()
+    if profiler.enabled:
+        st.caption(f"Profiling every rerun and conversion into {profiler.directory}")
+    else:
+        st.toggle("Profile my reruns and conversions", key="profile_session",
+                  help=f"cProfile and tracemalloc each rerun; profiles go to {profiler.directory}")
+    runs = profiler.recent_runs(PROFILE_VIEWER_RUNS)
+    if not runs:
+        st.caption("No profiles yet")
+        return
+    st.caption(f"Slowest functions over the last {len(runs)} runs")
+    st.dataframe(slowest_functions(runs, limit=10), hide_index=True, use_container_width=True)
+    labels = [
+        f"{time.strftime('%H:%M:%S', time.localtime(run['started']))} {run['label']} ({run['seconds']:.2f}s)"
+        for run in runs
+    ]
+    index = st.selectbox("Run", range(len(runs)), format_func=labels.__getitem__, key="profile_run")
+    run = runs[index]
+    st.dataframe(run['functions'][:10], hide_index=True, use_container_width=True)
+    st.caption("Top allocation sites")
+    st.dataframe(run['allocations'][:10], hide_index=True, use_container_width=True)
+    st.caption(f"pstats: {run['pstats']}")
 
-    # Main content area - Fixed two-column layout
-    col1, col2 = st.columns([1, 1])
+@st.fragment
+@profiled
+def render_history_list():
+    """Paginated history; paging reruns only this fragment"""
+    history = st.session_state.conversion_history
+    if not history:
+        st.info("No conversions yet")
+        return
     
-    with col1:
-        # Input Section
-        st.markdown("### 📥 Input Code")
-        st.markdown('<div class="input-card">', unsafe_allow_html=True)
-        
-        code_input = st.text_area(
-            "Enter your code here",
-            value=st.session_state.current_code_input,
-            placeholder="Paste your code here or use templates below...",
-            height=250,
-            label_visibility="collapsed",
-            key="code_input_main"
-        )
+    page_count = (len(history) - 1) // HISTORY_PAGE_SIZE + 1
+    page = min(st.session_state.history_page, page_count - 1)
+    end = len(history) - page * HISTORY_PAGE_SIZE
+    for item in reversed(history[max(end - HISTORY_PAGE_SIZE, 0):end]):
+        with st.container():
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.markdown(f"""
+                **{LANGUAGES[item['from_lang']]['icon']} → {LANGUAGES[item['to_lang']]['icon']}**
+                """)
+                st.caption(f"{item['timestamp'].split(' ')[1]}")
+            with col2:
+                if st.button("↻", key=f"reload_{item['id']}"):
+                    full_item = get_history_store().get(st.session_state.session_id, item['id'])
+                    if full_item is None:
+                        st.warning("This conversion is no longer available")
+                    else:
+                        # The editor widgets belong to other fragments, so they can be set before the full rerun
+                        load_code(full_item['input'], full_item['from_lang'], full_item['to_lang'])
+                        st.rerun()
+    
+    if page_count > 1:
+        nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+        with nav_col1:
+            if st.button("◀", key="history_newer", disabled=page == 0):
+                st.session_state.history_page = page - 1
+                st.rerun(scope="fragment")
+        with nav_col2:
+            st.caption(f"Page {page + 1} of {page_count}")
+        with nav_col3:
+            if st.button("▶", key="history_older", disabled=page == page_count - 1):
+                st.session_state.history_page = page + 1
+                st.rerun(scope="fragment")
+
+@st.fragment
+@profiled
+def render_input_panel():
+    """Editor, detection and analysis; editing reruns only this fragment"""
+    st.markdown("### 📥 Input Code")
+    st.markdown('<div class="input-card">', unsafe_allow_html=True)
+    
+    # The text area sends its value on blur or Ctrl+Enter, not per keystroke
+    code_input = st.text_area(
+        "Enter your code here",
+        placeholder="Paste your code here or use templates below...",
+        height=250,
+        label_visibility="collapsed",
+        key="code_input_main"
+    )
+    
+    # Auto-detect and analysis
+    if code_input and code_input.strip():
+        (detected_lang, confidence), analysis = get_input_insights(code_input)
+        if detected_lang != "unknown":
+            st.success(f"**Detected:** {get_language_display(detected_lang)} ({confidence:.0%} confidence)")
         
-        st.session_state.current_code_input = code_input
+        cols = st.columns(6)
+        metrics = [
+            ("Lines", analysis['total_lines']),
+            ("Code", analysis['code_lines']),
+            ("Comments", analysis['comment_lines']),
+            ("Ratio", f"{analysis['comment_ratio']:.1%}"),
+            ("Depth", analysis['max_nesting_depth']),
+            ("~Tokens", analysis['approx_tokens'])
+        ]
         
-        # Auto-detect and analysis
-        if code_input and code_input.strip():
-            detected_lang = detect_language(code_input)
-            if detected_lang != "unknown":
-                st.success(f"**Detected:** {get_language_display(detected_lang)}")
+        for col, (label, value) in zip(cols, metrics):
+            with col:
+                st.metric(label, value)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Quick Templates; they also change the source language, so the whole app reruns
+    st.markdown("### ⚡ Quick Templates")
+    temp_col1, temp_col2, temp_col3 = st.columns(3)
+    
+    with temp_col1:
+        if st.button("🐍 Python", use_container_width=True, key="py_temp",
+                     on_click=load_code, args=(set_code_template("python"), "python")):
+            st.rerun()
             
-            analysis = analyze_code_complexity(code_input)
-            cols = st.columns(4)
-            metrics = [
-                ("Lines", analysis['total_lines']),
-                ("Code", analysis['code_lines']),
-                ("Comments", analysis['comment_lines']),
-                ("Ratio", f"{analysis['comment_ratio']:.1%}")
-            ]
+    with temp_col2:
+        if st.button("📜 JavaScript", use_container_width=True, key="js_temp",
+                     on_click=load_code, args=(set_code_template("javascript"), "javascript")):
+            st.rerun()
             
-            for col, (label, value) in zip(cols, metrics):
-                with col:
-                    st.metric(label, value)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Quick Templates
-        st.markdown("### ⚡ Quick Templates")
-        temp_col1, temp_col2, temp_col3 = st.columns(3)
-        
-        with temp_col1:
-            if st.button("🐍 Python", use_container_width=True, key="py_temp"):
-                st.session_state.current_code_input = set_code_template("python")
-                st.session_state.current_source_lang = "python"
-                st.rerun()
-                
-        with temp_col2:
-            if st.button("📜 JavaScript", use_container_width=True, key="js_temp"):
-                st.session_state.current_code_input = set_code_template("javascript")
-                st.session_state.current_source_lang = "javascript"
-                st.rerun()
-                
-        with temp_col3:
-            if st.button("☕ Java", use_container_width=True, key="java_temp"):
-                st.session_state.current_code_input = set_code_template("java")
-                st.session_state.current_source_lang = "java"
-                st.rerun()
+    with temp_col3:
+        if st.button("☕ Java", use_container_width=True, key="java_temp",
+                     on_click=load_code, args=(set_code_template("java"), "java")):
+            st.rerun()
 
-    with col2:
-        # Settings Section
-        st.markdown("### ⚙️ Conversion Settings")
-        
-        # Language selection with swap
-        lang_col1, lang_col2, lang_col3 = st.columns([2, 2, 1])
-        
-        with lang_col1:
-            source_lang = st.selectbox(
-                "From Language",
-                list(LANGUAGES.keys()),
-                format_func=lambda x: get_language_display(x),
-                index=list(LANGUAGES.keys()).index(st.session_state.current_source_lang),
-                key="source_lang_select"
-            )
-        
-        with lang_col2:
-            available_targets = [lang for lang in LANGUAGES.keys() if lang != source_lang]
-            current_target_index = 0
-            if st.session_state.current_target_lang in available_targets:
-                current_target_index = available_targets.index(st.session_state.current_target_lang)
-                
-            target_lang = st.selectbox(
-                "To Language",
-                available_targets,
-                format_func=lambda x: get_language_display(x),
-                index=current_target_index,
-                key="target_lang_select"
-            )
-        
-        with lang_col3:
-            st.markdown("<br>", unsafe_allow_html=True)
-            if st.button("🔄", help="Swap languages"):
-                swap_languages()
-                st.rerun()
-        
-        st.session_state.current_source_lang = source_lang
-        st.session_state.current_target_lang = target_lang
-        
-        # Language info
-        source_info = get_language_info(source_lang)
-        target_info = get_language_info(target_lang)
-        
-        info_col1, info_col2 = st.columns(2)
-        with info_col1:
-            st.markdown(f"""
-            <div style='background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px; margin: 5px 0;'>
-                <strong>{get_language_display(source_lang)}</strong><br>
-                • {source_info['paradigm']}<br>
-                • {source_info['typing']} typing<br>
-                • {source_info['year']}
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with info_col2:
-            st.markdown(f"""
-            <div style='background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px; margin: 5px 0;'>
-                <strong>{get_language_display(target_lang)}</strong><br>
-                • {target_info['paradigm']}<br>
-                • {target_info['typing']} typing<br>
-                • {target_info['year']}
-            </div>
-            """, unsafe_allow_html=True)
-        
-        # Conversion options
-        st.markdown("### 🎯 Conversion Options")
-        
-        opt_col1, opt_col2 = st.columns(2)
-        with opt_col1:
-            optimization_level = st.select_slider(
-                "Optimization",
-                options=["Basic", "Optimized", "Highly Optimized"],
-                value="Optimized"
-            )
+@st.fragment
+@profiled
+def render_settings_panel():
+    """Language selection, language info and conversion options"""
+    # The features fragment shows the target language too; callbacks cannot call st.rerun themselves
+    if st.session_state.pop("languages_changed", False):
+        st.rerun()
+    st.markdown("### ⚙️ Conversion Settings")
+    
+    # Language selection with swap
+    lang_col1, lang_col2, lang_col3 = st.columns([2, 2, 1])
+    
+    with lang_col1:
+        source_lang = st.selectbox(
+            "From Language",
+            list(LANGUAGES.keys()),
+            format_func=lambda x: get_language_display(x),
+            key="source_lang_select",
+            on_change=languages_changed
+        )
+    
+    with lang_col2:
+        available_targets = [lang for lang in LANGUAGES.keys() if lang != source_lang]
+        if st.session_state.target_lang_select not in available_targets:
+            st.session_state.target_lang_select = available_targets[0]
             
-        with opt_col2:
-            include_comments = st.checkbox("Include Comments", value=True)
-            add_error_handling = st.checkbox("Add Error Handling", value=False)
+        target_lang = st.selectbox(
+            "To Language",
+            available_targets,
+            format_func=lambda x: get_language_display(x),
+            key="target_lang_select",
+            on_change=languages_changed
+        )
+    
+    with lang_col3:
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.button("🔄", help="Swap languages", on_click=swap_languages)
+    
+    # Fan-out mode converts into every selected language concurrently
+    if st.toggle("Convert to several languages", key="multi_target"):
+        selected = [lang for lang in st.session_state.get("target_langs_select", []) if lang in available_targets]
+        st.session_state.target_langs_select = selected or [target_lang]
+        st.multiselect(
+            "Target Languages",
+            available_targets,
+            format_func=lambda x: get_language_display(x),
+            key="target_langs_select"
+        )
+    
+    # Language info
+    source_info = get_language_info(source_lang)
+    target_info = get_language_info(target_lang)
+    
+    info_col1, info_col2 = st.columns(2)
+    with info_col1:
+        st.markdown(f"""
+        <div style='background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px; margin: 5px 0;'>
+            <strong>{get_language_display(source_lang)}</strong><br>
+            • {source_info['paradigm']}<br>
+            • {source_info['typing']} typing<br>
+            • {source_info['year']}
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with info_col2:
+        st.markdown(f"""
+        <div style='background: rgba(255,255,255,0.1); padding: 15px; border-radius: 10px; margin: 5px 0;'>
+            <strong>{get_language_display(target_lang)}</strong><br>
+            • {target_info['paradigm']}<br>
+            • {target_info['typing']} typing<br>
+            • {target_info['year']}
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Conversion options
+    st.markdown("### 🎯 Conversion Options")
+    
+    opt_col1, opt_col2 = st.columns(2)
+    with opt_col1:
+        st.select_slider(
+            "Optimization",
+            options=["Basic", "Optimized", "Highly Optimized"],
+            value="Optimized",
+            key="optimization_level"
+        )
+        
+    with opt_col2:
+        st.checkbox("Include Comments", value=True, key="include_comments")
+        st.checkbox("Add Error Handling", value=False, key="add_error_handling")
+        st.checkbox("Stream Output", value=True, help="Render the result as it is generated", key="stream_output")
 
+@st.fragment
+@profiled
+def render_conversion_panel():
+    """Convert button and result; a finished conversion reruns the app so the sidebar history updates"""
+    engine = get_engine()
+    
     # Convert Button - Centered
     st.markdown("---")
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -580,106 +620,295 @@ def main():
             type="primary",
             key="convert_btn_main"
         )
+    with col3:
+        queue_clicked = st.button(
+            "⏳ Queue",
+            use_container_width=True,
+            help="Convert in the background and keep editing",
+            key="queue_btn_main"
+        )
 
-    # Conversion Logic and Results
-    if convert_clicked:
-        if code_input and code_input.strip():
+    if queue_clicked:
+        if queue_conversions():
+            # Show the jobs panel, which polls until the jobs finish
+            st.rerun()
+        return
+
+    if not convert_clicked:
+        if st.session_state.last_conversions:
+            render_conversions(st.session_state.last_conversions)
+        return
+    
+    # Read the widgets' state directly: other fragments may not have rerun since their last edit
+    code_input = st.session_state.code_input_main
+    source_lang = st.session_state.source_lang_select
+    target_lang = st.session_state.target_lang_select
+    if not (code_input and code_input.strip()):
+        st.warning("Please enter some code to convert.")
+        return
+    
+    target_langs = get_target_languages()
+    if len(target_langs) > 1:
+        st.markdown("### ✅ Conversion Result")
+        st.session_state.last_conversions = run_fan_out(
+            engine, code_input, source_lang, target_langs, get_conversion_options(), profile=profiling_requested()
+        )
+        st.rerun()
+    target_lang = target_langs[0]
+    
+    try:
+        options = get_conversion_options()
+        result = engine.cached(code_input, source_lang, target_lang, options)
+        from_cache = result is not None
+        timings = {}
+        
+        st.markdown("### ✅ Conversion Result")
+        result_placeholder = st.empty()
+        
+        if from_cache:
+            st.caption("⚡ Served from cache")
+        elif engine.needs_chunking(code_input):
+            progress = st.progress(0.0, text="Converting in chunks...")
+            result = engine.run_shared(
+                code_input, source_lang, target_lang, options,
+                on_progress=lambda done, total: progress.progress(done / total, text=f"Converted chunk {done}/{total}"),
+                timings=timings, profile=profiling_requested()
+            )
+            progress.empty()
+        elif st.session_state.stream_output:
+            result = render_streamed_conversion(
+                result_placeholder,
+                engine.stream(code_input, source_lang, target_lang, options, timings=timings, profile=profiling_requested()),
+                target_lang,
+                timings
+            )
+        else:
             with st.spinner(f"Converting from {get_language_display(source_lang)} to {get_language_display(target_lang)}..."):
-                try:
-                    # Create prompt template
-                    template = PromptTemplate(
-                        template=(
-                            "Convert the following code from {source_lang} to {target_lang}. "
-                            "Optimization level: {optimization_level}. "
-                            "{comments_instruction}"
-                            "{error_handling_instruction}"
-                            "\n\nOriginal code:\n```{source_lang}\n{programme}\n```\n\n"
-                            "Converted code:\n"
-                        ),
-                        input_variables=['programme', 'source_lang', 'target_lang', 'optimization_level', 'comments_instruction', 'error_handling_instruction']
-                    )
-                    
-                    comments_instruction = "Preserve all comments." if include_comments else "Remove all comments."
-                    error_handling_instruction = "Add error handling." if add_error_handling else ""
-                    
-                    chain = template | model | parser
-                    result = chain.invoke({
-                        'programme': code_input,
-                        'source_lang': source_lang,
-                        'target_lang': target_lang,
-                        'optimization_level': optimization_level,
-                        'comments_instruction': comments_instruction,
-                        'error_handling_instruction': error_handling_instruction
-                    })
-                    
-                    # Store in history
-                    history_item = {
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'input': code_input,
-                        'output': result,
-                        'from_lang': source_lang,
-                        'to_lang': target_lang
-                    }
-                    
-                    st.session_state.conversion_history.append(history_item)
-                    st.session_state.total_conversions += 1
-                    st.session_state.converted_code = result
-                    
-                    # Display Results
-                    st.markdown("### ✅ Conversion Result")
-                    st.markdown('<div class="output-card">', unsafe_allow_html=True)
-                    
-                    st.code(result, language=target_lang)
-                    
-                    # Action buttons
-                    st.markdown("### 🛠️ Actions")
-                    action_col1, action_col2, action_col3 = st.columns(3)
-                    
-                    with action_col1:
-                        if st.button("📋 Copy Code", use_container_width=True):
-                            if copy_to_clipboard(result):
-                                st.success("Copied to clipboard!")
-                    
-                    with action_col2:
-                        filename = f"converted_code.{target_lang}"
-                        st.download_button(
-                            "💾 Download",
-                            result,
-                            file_name=filename,
-                            mime="text/plain",
-                            use_container_width=True
-                        )
-                    
-                    with action_col3:
-                        if st.button("🔄 New", use_container_width=True):
-                            st.session_state.current_code_input = ""
-                            st.rerun()
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Metrics
-                    with st.expander("📊 Conversion Metrics"):
-                        input_analysis = analyze_code_complexity(code_input)
-                        output_analysis = analyze_code_complexity(result)
-                        
-                        met_col1, met_col2, met_col3, met_col4 = st.columns(4)
-                        with met_col1:
-                            st.metric("Input Lines", input_analysis['total_lines'])
-                        with met_col2:
-                            st.metric("Output Lines", output_analysis['total_lines'])
-                        with met_col3:
-                            st.metric("Input Chars", len(code_input))
-                        with met_col4:
-                            st.metric("Output Chars", len(result))
-                        
-                except Exception as e:
-                    st.error(f"Conversion failed: {str(e)}")
+                result = engine.run_shared(
+                    code_input, source_lang, target_lang, options, timings=timings, profile=profiling_requested()
+                )
+        
+        render_start = time.perf_counter()
+        result_placeholder.code(result, language=target_lang)
+        add_timing(timings, 'render', time.perf_counter() - render_start)
+        st.session_state.last_conversions = [
+            finish_conversion(code_input, result, source_lang, target_lang, from_cache, timings)
+        ]
+    except Exception as e:
+        st.error(f"Conversion failed: {str(e)}")
+        return
+    
+    st.rerun()
+
+def queue_conversions():
+    """Submit the editor's code to the background queue, one job per target; returns whether anything was queued"""
+    code_input = st.session_state.code_input_main
+    if not (code_input and code_input.strip()):
+        st.warning("Please enter some code to convert.")
+        return False
+    queue = get_job_queue()
+    options = get_conversion_options()
+    st.session_state.job_ids.extend(
+        queue.submit(code_input, st.session_state.source_lang_select, target_lang, options)
+        for target_lang in get_target_languages()
+    )
+    return True
+
+def render_jobs_panel():
+    """This session's background jobs; the list polls while any of them is unfinished"""
+    if not st.session_state.job_ids:
+        return
+    queue = get_job_queue()
+    jobs = [queue.get(job_id) for job_id in st.session_state.job_ids]
+    pending = any(job is not None and not job.finished for job in jobs)
+    st.markdown("### 🗂️ Background Jobs")
+    st.fragment(render_job_list, run_every=JOB_POLL_SECONDS if pending else None)()
+
+def render_job_list():
+    queue = get_job_queue()
+    jobs = [job for job in map(queue.get, st.session_state.job_ids) if job is not None]
+    
+    # Finished jobs go into history once; the full rerun refreshes the sidebar and stops polling
+    newly_finished = [job for job in jobs if job.finished and job.id not in st.session_state.collected_jobs]
+    for job in newly_finished:
+        st.session_state.collected_jobs.add(job.id)
+        if job.status == DONE:
+            get_metrics_registry().record(job.timings, cached=job.from_cache)
+            record_history(make_history_item(job.code, job.output, job.source_lang, job.target_lang, **job.timings))
+            st.session_state.total_conversions += 1
+    if newly_finished and all(job.finished for job in jobs):
+        st.rerun()
+    
+    stats = queue.stats()
+    st.caption(f"{stats['queued']} queued • {stats['running']} running on {stats['workers']} workers")
+    for job in reversed(jobs):
+        label = (
+            f"{JOB_STATUS_ICONS[job.status]} {get_language_display(job.source_lang)} → "
+            f"{get_language_display(job.target_lang)} • {job.status}"
+        )
+        if job.status == DONE:
+            with st.expander(label):
+                st.code(job.output, language=job.target_lang)
+                st.download_button(
+                    "💾 Download",
+                    job.output,
+                    file_name=f"converted_code.{job.target_lang}",
+                    mime="text/plain",
+                    key=f"job_download_{job.id}"
+                )
+        elif job.status == FAILED:
+            st.error(f"{label}: {job.error}")
         else:
-            st.warning("Please enter some code to convert.")
+            st.caption(label)
+    
+    if st.button("Clear finished jobs", key="clear_jobs"):
+        st.session_state.job_ids = [job.id for job in jobs if not job.finished]
+        st.rerun()
 
-    # Features Section - Always visible
-    st.markdown("---")
-    st.markdown("## ✨ Advanced Features")
+def finish_conversion(code_input, result, source_lang, target_lang, from_cache, timings):
+    """Record metrics and history for one finished conversion and return its session entry"""
+    get_metrics_registry().record(timings, cached=from_cache)
+    
+    # Store in history
+    history_item = make_history_item(code_input, result, source_lang, target_lang, **timings)
+    
+    record_history(history_item)
+    st.session_state.total_conversions += 1
+    st.session_state.converted_code = result
+    return {
+        'input': code_input,
+        'output': result,
+        'source_lang': source_lang,
+        'target_lang': target_lang,
+        'from_cache': from_cache,
+        'timings': timings
+    }
+
+def run_fan_out(engine, code_input, source_lang, target_langs, options, profile=False):
+    """Convert into several languages concurrently, filling each target's tab as it finishes"""
+    placeholders = {}
+    for tab, target_lang in zip(st.tabs([get_language_display(lang) for lang in target_langs]), target_langs):
+        with tab:
+            placeholders[target_lang] = st.empty()
+            placeholders[target_lang].info(f"Converting to {get_language_display(target_lang)}...")
+    
+    conversions = {}
+    for outcome in engine.convert_targets(code_input, source_lang, target_langs, options, profile=profile):
+        placeholder = placeholders[outcome.target_lang]
+        if not outcome.ok:
+            placeholder.error(f"Conversion failed: {outcome.error}")
+            conversions[outcome.target_lang] = {'target_lang': outcome.target_lang, 'error': outcome.error}
+            continue
+        render_start = time.perf_counter()
+        placeholder.code(outcome.output, language=outcome.target_lang)
+        add_timing(outcome.timings, 'render', time.perf_counter() - render_start)
+        conversions[outcome.target_lang] = finish_conversion(
+            code_input, outcome.output, source_lang, outcome.target_lang, outcome.from_cache, outcome.timings
+        )
+    return [conversions[target_lang] for target_lang in target_langs]
+
+def render_conversions(conversions):
+    """The last conversion's results, in a tab per target when there are several"""
+    st.markdown("### ✅ Conversion Result")
+    if len(conversions) == 1:
+        render_conversion_result(conversions[0])
+        return
+    tabs = st.tabs([get_language_display(conversion['target_lang']) for conversion in conversions])
+    for tab, conversion in zip(tabs, conversions):
+        with tab:
+            render_conversion_result(conversion, key=conversion['target_lang'])
+
+def render_conversion_result(conversion, key="main"):
+    """Result, actions and metrics of a finished conversion; key keeps widgets in separate tabs apart"""
+    if 'error' in conversion:
+        st.error(f"Conversion failed: {conversion['error']}")
+        return
+    result = conversion['output']
+    target_lang = conversion['target_lang']
+    timings = conversion['timings']
+    
+    st.markdown('<div class="output-card">', unsafe_allow_html=True)
+    st.code(result, language=target_lang)
+    if conversion['from_cache']:
+        st.caption("⚡ Served from cache")
+    elif timings.get('reused_chunks'):
+        st.caption(f"♻️ Reused {int(timings['reused_chunks'])} of {int(timings['chunks'])} chunks from earlier conversions")
+    
+    # Action buttons
+    st.markdown("### 🛠️ Actions")
+    action_col1, action_col2, action_col3 = st.columns(3)
+    
+    with action_col1:
+        if st.button("📋 Copy Code", use_container_width=True, key=f"copy_{key}"):
+            if copy_to_clipboard(result):
+                st.success("Copied to clipboard!")
+    
+    with action_col2:
+        filename = f"converted_code.{target_lang}"
+        st.download_button(
+            "💾 Download",
+            result,
+            file_name=filename,
+            mime="text/plain",
+            use_container_width=True,
+            key=f"download_{key}"
+        )
+    
+    with action_col3:
+        if st.button("🔄 New", use_container_width=True, key=f"new_{key}", on_click=start_new_conversion):
+            st.rerun()
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Metrics
+    with st.expander("📊 Conversion Metrics"):
+        input_analysis = analyze_code_complexity(conversion['input'])
+        output_analysis = analyze_code_complexity(result)
+        
+        met_col1, met_col2, met_col3, met_col4 = st.columns(4)
+        with met_col1:
+            st.metric("Input Lines", input_analysis['total_lines'])
+        with met_col2:
+            st.metric("Output Lines", output_analysis['total_lines'])
+        with met_col3:
+            st.metric("Input Chars", len(conversion['input']))
+        with met_col4:
+            st.metric("Output Chars", len(result))
+        
+        stage_labels = {
+            'prompt_format': "Prompt",
+            'time_to_first_token': "First Token",
+            'model_latency': "Model",
+            'output_parse': "Parse",
+            'render': "Render",
+            'generation_time': "Total"
+        }
+        stage_cols = st.columns(len(stage_labels))
+        for col, (stage, label) in zip(stage_cols, stage_labels.items()):
+            with col:
+                st.metric(label, f"{timings[stage]:.3f}s" if stage in timings else "—")
+        
+        token_col1, token_col2 = st.columns(2)
+        with token_col1:
+            st.metric("Input Tokens", int(timings.get('input_tokens', 0)))
+        with token_col2:
+            st.metric("Output Tokens", int(timings.get('output_tokens', 0)))
+        
+        summary = get_metrics_registry().summary()
+        if summary:
+            st.caption("Across all sessions (recent conversions)")
+            st.dataframe(
+                lazy_import("pandas").DataFrame.from_dict(summary, orient="index").rename(index=stage_labels),
+                use_container_width=True
+            )
+
+@st.fragment
+@profiled
+def render_features():
+    """Analysis, batch processing and optimization cards"""
+    engine = get_engine()
+    code_input = st.session_state.code_input_main
+    target_lang = st.session_state.target_lang_select
     
     feat_col1, feat_col2, feat_col3 = st.columns(3)
     
@@ -690,7 +919,11 @@ def main():
         if st.button("Run Analysis", key="analyze_btn"):
             if code_input:
                 analysis = analyze_code_complexity(code_input)
-                st.info(f"Analysis: {analysis['code_lines']} code lines, {analysis['comment_lines']} comments")
+                st.info(
+                    f"Analysis: {analysis['code_lines']} code lines, {analysis['comment_lines']} comments, "
+                    f"{analysis['block_comments']} block comments, max nesting depth {analysis['max_nesting_depth']}, "
+                    f"~{analysis['approx_tokens']} tokens"
+                )
             else:
                 st.warning("Enter code first")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -703,10 +936,53 @@ def main():
             "Upload files", 
             accept_multiple_files=True, 
             label_visibility="collapsed",
+            help="Source files, or zip archives of whole directories",
             key="file_upload"
         )
         if uploaded_files:
             st.success(f"{len(uploaded_files)} files ready")
+            if st.button(f"Convert all to {get_language_display(target_lang)}", key="batch_convert_btn"):
+                files = read_uploaded_files(uploaded_files)
+                options = get_conversion_options()
+                progress = st.progress(0.0, text="Starting batch...")
+                results = []
+                # Worker threads cannot read session state
+                profile = profiling_requested()
+                
+                def convert_file(code, source, target):
+                    return engine.convert(code, source, target, options, profile=profile)
+                
+                def track_progress(batch):
+                    for result in batch:
+                        results.append(result)
+                        status = "✅" if result.ok else "❌"
+                        progress.progress(len(results) / len(files), text=f"{status} {result.name} ({len(results)}/{len(files)})")
+                        yield result
+                
+                batch = iter_batch_conversions(
+                    files, target_lang, convert_file, detect_language,
+                    max_workers=int(os.getenv("BATCH_MAX_WORKERS", DEFAULT_BATCH_WORKERS))
+                )
+                st.session_state.batch_zip = write_results_zip(track_progress(batch)).getvalue()
+                st.session_state.batch_results = results
+                st.session_state.total_conversions += sum(1 for result in results if result.ok)
+                # The sidebar stats changed
+                st.rerun()
+        
+        if st.session_state.batch_results:
+            failed = [result for result in st.session_state.batch_results if not result.ok]
+            converted = len(st.session_state.batch_results) - len(failed)
+            st.info(f"{converted} converted, {len(failed)} failed")
+            for result in failed:
+                st.caption(f"❌ {result.name}: {result.error}")
+            st.download_button(
+                "📦 Download ZIP",
+                st.session_state.batch_zip,
+                file_name=f"converted_{target_lang}.zip",
+                mime="application/zip",
+                use_container_width=True,
+                key="batch_download"
+            )
         st.markdown('</div>', unsafe_allow_html=True)
     
     with feat_col3:
@@ -716,6 +992,36 @@ def main():
         if st.button("Optimize", key="optimize_btn"):
             st.info("Optimization feature coming soon!")
         st.markdown('</div>', unsafe_allow_html=True)
+    
+    if uploaded_files:
+        render_upload_report(uploaded_files, target_lang)
+
+def main():
+    # Header
+    st.markdown('<h1 class="main-header">💻 Code Converter Pro</h1>', unsafe_allow_html=True)
+    st.markdown('<p class="sub-header">Transform your code between 15+ programming languages with AI-powered precision</p>', unsafe_allow_html=True)
+    
+    # Sidebar - Fixed layout
+    with st.sidebar:
+        render_sidebar()
+
+    # Main content area - Fixed two-column layout; each panel reruns on its own
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        render_input_panel()
+
+    with col2:
+        render_settings_panel()
+
+    # Conversion Logic and Results
+    render_conversion_panel()
+    render_jobs_panel()
+
+    # Features Section - Always visible
+    st.markdown("---")
+    st.markdown("## ✨ Advanced Features")
+    render_features()
 
     # Footer
     st.markdown("---")
@@ -727,4 +1033,6 @@ def main():
     )
 
 if __name__ == "__main__":
-    main()
+    with get_profiler().run("rerun", enabled=profiling_requested()):
+        main()
+    mark("first_run_complete")
@@ -0,0 +1,128 @@
+import io
+import os
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
+
+DEFAULT_BATCH_WORKERS = 4
+
+# Directories never scanned for source files
+SKIPPED_DIRECTORIES = {".git", ".hg", ".svn", "node_modules", "__pycache__", "venv", ".venv", "build", "dist"}
+
+# File extensions per language key, used for output names and to recognise a file's language
+FILE_EXTENSIONS = {
+    "python": "py",
+    "javascript": "js",
+    "java": "java",
+    "c++": "cpp",
+    "c": "c",
+    "c#": "cs",
+    "php": "php",
+    "go": "go",
+    "rust": "rs",
+    "typescript": "ts",
+    "r": "r",
+    "perl": "pl",
+    "lua": "lua",
+    "kotlin": "kt",
+    "swift": "swift",
+    "ruby": "rb",
+    "scala": "scala",
+    "dart": "dart"
+}
+
+EXTENSION_LANGUAGES = {ext: lang for lang, ext in FILE_EXTENSIONS.items()}
+EXTENSION_LANGUAGES.update({"jsx": "javascript", "tsx": "typescript", "cc": "c++", "cxx": "c++", "hpp": "c++", "h": "c", "kts": "kotlin"})
+
+
+@dataclass
+class BatchResult:
+    """Outcome of converting one file in a batch"""
+    name: str
+    source_lang: str
+    target_lang: str
+    output: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def output_name(self):
+        stem = os.path.splitext(self.name)[0]
+        return f"{stem}.{FILE_EXTENSIONS.get(self.target_lang, 'txt')}"
+
+
+def output_names(names, target_lang):
+    """Output file name per input name
+
+    Inputs that share a stem, such as foo.c and foo.h, keep their extension so their
+    outputs do not overwrite each other: foo.c.go and foo.h.go.
+    """
+    extension = FILE_EXTENSIONS.get(target_lang, 'txt')
+    stems = Counter(os.path.splitext(name)[0] for name in names)
+    return {
+        name: f"{os.path.splitext(name)[0]}.{extension}" if stems[os.path.splitext(name)[0]] == 1 else f"{name}.{extension}"
+        for name in names
+    }
+
+
+def detect_file_language(name, code, detect_fn):
+    """Language of a file from its extension, detected from its content only for unknown extensions"""
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    if extension in EXTENSION_LANGUAGES:
+        return EXTENSION_LANGUAGES[extension]
+    return detect_fn(code)
+
+
+def _convert_one(name, code, source_lang, target_lang, convert_fn):
+    if source_lang == "unknown":
+        return BatchResult(name, source_lang, target_lang, error="Could not detect source language")
+    if source_lang == target_lang:
+        return BatchResult(name, source_lang, target_lang, output=code)
+    try:
+        return BatchResult(name, source_lang, target_lang, output=convert_fn(code, source_lang, target_lang))
+    except Exception as e:
+        return BatchResult(name, source_lang, target_lang, error=str(e))
+
+
+def iter_batch_conversions(files, target_lang, convert_fn, detect_fn, max_workers=DEFAULT_BATCH_WORKERS, source_lang=None):
+    """Convert (name, code) pairs concurrently, yielding a BatchResult as each file finishes
+
+    At most max_workers conversions run at once. A failing file yields a result with
+    an error instead of aborting the rest of the batch. Each file's language is
+    detected unless source_lang is given.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _convert_one, name, code,
+                source_lang or detect_file_language(name, code, detect_fn), target_lang, convert_fn
+            )
+            for name, code in files
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def write_results_zip(results, fileobj=None):
+    """Write successful results into a zip archive as they arrive and return the file object
+
+    results may be any iterable (including iter_batch_conversions), so each file is
+    compressed as soon as its conversion completes.
+    """
+    fileobj = fileobj if fileobj is not None else io.BytesIO()
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        written = set()
+        for result in results:
+            if result.ok:
+                name = result.output_name
+                if name in written:
+                    name = f"{result.name}.{FILE_EXTENSIONS.get(result.target_lang, 'txt')}"
+                written.add(name)
+                archive.writestr(name, result.output)
+    fileobj.seek(0)
+    return fileobj
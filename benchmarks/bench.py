@@ -0,0 +1,222 @@
+"""Offline performance benchmarks for the code converter.
+
+Runs entirely locally: the Gemini client is replaced by fake_llm.FakeChatModel.
+
+    python benchmarks/bench.py --output bench_results.json
+    python benchmarks/bench.py --quick --baseline bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analysis
+from analysis import analyze_code_complexity
+from chunking import plan_chunks
+from detection import detect_language
+from engine import CONVERSION_PROMPT, ConversionEngine, ConversionOptions, build_conversion_inputs
+from fake_llm import FakeChatModel
+
+APP_PATH = os.path.join(ROOT, "app.py")
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+SIZES = [10, 100, 1000, 10000, 50000]
+QUICK_SIZES = [10, 100, 1000]
+
+FUNCTION_TEMPLATE = '''def fibonacci_{index}(n):
+    # Calculate Fibonacci sequence
+    if n <= 1:
+        return n
+    else:
+        return fibonacci_{index}(n-1) + fibonacci_{index}(n-2)
+
+'''
+
+RUST_TEMPLATE = '''pub fn longest_{index}<'a>(x: &'a str, y: &str) -> &'a str {{
+    // Pick the longer of two strings
+    let open = '{{';
+    if x.len() > y.len() {{
+        x
+    }} else {{
+        y
+    }}
+}}
+
+struct Holder_{index}<'a> {{
+    name: &'a str,
+}}
+
+'''
+
+
+def make_python_source(lines):
+    """Deterministic Python source of roughly the given number of lines"""
+    header = "import os\nimport sys\n\n"
+    parts, count, index = [header], header.count('\n'), 0
+    while count < lines:
+        parts.append(FUNCTION_TEMPLATE.format(index=index))
+        count += FUNCTION_TEMPLATE.count('\n')
+        index += 1
+    return ''.join(parts)
+
+
+def make_rust_source(lines):
+    """Deterministic Rust source of roughly the given number of lines, with lifetimes and char literals"""
+    parts, count, index = ["use std::fmt;\n\n"], 2, 0
+    while count < lines:
+        parts.append(RUST_TEMPLATE.format(index=index))
+        count += RUST_TEMPLATE.count('\n')
+        index += 1
+    return ''.join(parts)
+
+
+def measure(fn, repeat):
+    """Median wall-clock seconds of fn over repeat runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def bench_detection(sources, repeat):
+    # Detection memoizes per prefix, so vary the text to measure a cold scan
+    return {
+        f"detect_language[{size}]": measure(lambda: detect_language(source + f"\n# {time.perf_counter_ns()}"), repeat)
+        for size, source in sources.items()
+    }
+
+
+def bench_analysis(sources, repeat):
+    def cold(source):
+        analysis._cache.clear()
+        analyze_code_complexity(source)
+    return {f"analyze_code_complexity[{size}]": measure(lambda: cold(source), repeat) for size, source in sources.items()}
+
+
+def bench_chunking(sizes, repeat):
+    """Time chunk planning of Rust sources and check every chunk starts at a top-level definition"""
+    results = {}
+    for size in sizes:
+        source = make_rust_source(size)
+        results[f"plan_chunks[{size}]"] = measure(lambda: plan_chunks(source, "rust", 20), repeat)
+        # One unit per chunk, so every split point is checked
+        for chunk in plan_chunks(source, "rust", 1).chunks[1:]:
+            if not chunk.code.lstrip().startswith(("pub fn ", "struct ")):
+                raise RuntimeError(f"chunk {chunk.index} starts mid-definition at line {chunk.start_line + 1}")
+    return results
+
+
+def bench_prompt(sources, repeat):
+    options = ConversionOptions()
+    return {
+        f"prompt_format[{size}]": measure(
+            lambda: CONVERSION_PROMPT.format(**build_conversion_inputs(source, "python", "javascript", options)), repeat
+        )
+        for size, source in sources.items()
+    }
+
+
+def bench_conversion(sources, repeat, latency, tokens_per_second):
+    engine = ConversionEngine(model=FakeChatModel(latency=latency, tokens_per_second=tokens_per_second), cache=None)
+    results = {}
+    for size, source in sources.items():
+        seconds = measure(lambda: engine.convert(source, "python", "javascript"), repeat)
+        results[f"convert[{size}]"] = seconds
+        results[f"convert_lines_per_second[{size}]"] = size / seconds if seconds else float("inf")
+    return results
+
+
+def bench_app(source, repeat):
+    """Time a cold script run, an input rerun and a conversion rerun through AppTest"""
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    with mock.patch("engine.create_model", lambda *args, **kwargs: FakeChatModel()):
+        app = AppTest.from_file(APP_PATH, default_timeout=120)
+        results["app_first_run"] = measure(app.run, 1)
+        results["app_input_rerun"] = measure(
+            lambda: app.text_area(key="code_input_main").input(source + f"\n# {time.perf_counter_ns()}").run(), repeat
+        )
+        results["app_convert_rerun"] = measure(lambda: app.button(key="convert_btn_main").click().run(), repeat)
+        if app.exception:
+            raise RuntimeError(f"app raised during benchmark: {app.exception}")
+    return results
+
+
+def check(metrics, thresholds, baseline, tolerance):
+    """Return human-readable regressions against absolute thresholds and a previous run"""
+    failures = []
+    for name, limit in thresholds.items():
+        if name in metrics and metrics[name] > limit:
+            failures.append(f"{name}: {metrics[name]:.4f}s exceeds threshold {limit:.4f}s")
+    for name, previous in (baseline or {}).items():
+        if name in metrics and "per_second" not in name and metrics[name] > previous * (1 + tolerance):
+            failures.append(f"{name}: {metrics[name]:.4f}s is more than {tolerance:.0%} slower than baseline {previous:.4f}s")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="JSON file of per-metric limits in seconds")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown relative to the baseline")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="only inputs up to 1,000 lines")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake model latency before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake model generation rate (0 = instant)")
+    parser.add_argument("--skip-app", action="store_true", help="skip the Streamlit AppTest benchmarks")
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix="converter-bench-")
+    os.environ["CONVERSION_CACHE_DB"] = os.path.join(scratch, "cache.sqlite3")
+    os.environ["HISTORY_DB"] = os.path.join(scratch, "history.sqlite3")
+
+    sources = {size: make_python_source(size) for size in (QUICK_SIZES if args.quick else SIZES)}
+    metrics = {}
+    metrics.update(bench_detection(sources, args.repeat))
+    metrics.update(bench_analysis(sources, args.repeat))
+    metrics.update(bench_chunking(sources, args.repeat))
+    metrics.update(bench_prompt(sources, args.repeat))
+    metrics.update(bench_conversion(sources, min(args.repeat, 3), args.latency, args.tokens_per_second))
+    if not args.skip_app:
+        metrics.update(bench_app(sources[100], args.repeat))
+
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+
+    failures = check(metrics, thresholds, baseline, args.tolerance)
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "parameters": {"repeat": args.repeat, "latency": args.latency, "tokens_per_second": args.tokens_per_second},
+        "metrics": metrics,
+        "regressions": failures,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, value in metrics.items():
+        unit = "lines/s" if "per_second" in name else "s"
+        print(f"{name:40} {value:12.4f} {unit}")
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
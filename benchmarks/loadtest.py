@@ -0,0 +1,239 @@
+"""Multi-session load test for the Streamlit app, for sizing replicas.
+
+Drives N simulated sessions through paste, detect, convert, reload-from-history and
+batch-upload flows. The Gemini client is replaced by fake_llm.FakeChatModel, so it
+runs offline. Sessions are spread over worker processes, because streamlit's AppTest
+runs one script at a time per process; memory is measured per session above each
+worker's warmed-up baseline. Linux only (reads /proc).
+
+    python benchmarks/loadtest.py --sessions 20 --rounds 5 --latency 0.5
+    python benchmarks/loadtest.py --sessions 50 --workers 8 --output loadtest_results.json
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_llm import FakeChatModel
+from metrics import percentile
+from templates import CODE_TEMPLATES
+
+APP_PATH = os.path.join(ROOT, "app.py")
+ACTIONS = ("first_run", "paste", "convert", "reload", "upload", "batch")
+BATCH_FILES = 3
+
+# Files served by the patched uploader to sessions that set LOADTEST_UPLOAD_KEY
+LOADTEST_UPLOAD_KEY = "loadtest_upload"
+
+
+class FakeUpload:
+    """Stand-in for streamlit's UploadedFile"""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.file_id = f"{name}-{hash(data)}"
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+
+def fake_file_uploader(*args, **kwargs):
+    import streamlit as st
+    return st.session_state.get(LOADTEST_UPLOAD_KEY) or []
+
+
+def resident_memory():
+    """Resident set size of this process in bytes"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def make_snippet(session, round_index):
+    """A template made unique per session and round, so conversions are not cache hits"""
+    return f"{CODE_TEMPLATES['python']}\n# session {session} round {round_index}\n"
+
+
+class SessionDriver:
+    """One simulated user: an AppTest session and the latency of every rerun it triggered"""
+
+    def __init__(self, index, rng):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.rng = rng
+        self.app = AppTest.from_file(APP_PATH, default_timeout=300)
+        self.latencies = {action: [] for action in ACTIONS}
+        self.conversions = 0
+        self.errors = []
+
+    def _timed(self, action, fn):
+        start = time.perf_counter()
+        fn()
+        self.latencies[action].append(time.perf_counter() - start)
+        if self.app.exception:
+            self.errors.append(f"{action}: {self.app.exception[0].message}")
+
+    def start(self):
+        self._timed("first_run", self.app.run)
+
+    def run_round(self, round_index, batch_every):
+        app = self.app
+        # Pasting reruns the app, which detects the language of the new text
+        self._timed("paste", lambda: app.text_area(key="code_input_main").input(make_snippet(self.index, round_index)).run())
+        self._timed("convert", lambda: app.button(key="convert_btn_main").click().run())
+        self.conversions += 1
+
+        reload_keys = [button.key for button in app.button if (button.key or "").startswith("reload_")]
+        if reload_keys:
+            self._timed("reload", lambda: app.button(key=self.rng.choice(reload_keys)).click().run())
+
+        if batch_every and round_index % batch_every == batch_every - 1:
+            app.session_state[LOADTEST_UPLOAD_KEY] = [
+                FakeUpload(f"file_{self.index}_{round_index}_{n}.py", make_snippet(self.index * 1000 + n, round_index).encode())
+                for n in range(BATCH_FILES)
+            ]
+            # The upload rerun shows the conversion plan and the batch button
+            self._timed("upload", app.run)
+            self._timed("batch", lambda: app.button(key="batch_convert_btn").click().run())
+            app.session_state[LOADTEST_UPLOAD_KEY] = []
+            self.conversions += BATCH_FILES
+
+    def state_size(self):
+        """(history entries, pickled bytes of the conversion history) held in session state"""
+        history = self.app.session_state["conversion_history"]
+        return len(history), len(pickle.dumps(list(history)))
+
+
+def run_worker(session_indices, rounds, batch_every, latency, tokens_per_second, seed):
+    """Host a group of sessions in this process and drive them round by round
+
+    AppTest runs one script at a time per process (it owns the process-wide
+    runtime), so concurrency comes from several worker processes.
+    """
+    model = lambda *args, **kwargs: FakeChatModel(latency=latency, tokens_per_second=tokens_per_second)
+    with mock.patch("engine.create_model", model), mock.patch("streamlit.file_uploader", fake_file_uploader):
+        # A throwaway session through every flow loads the lazy imports and process-wide
+        # resources, so they are not charged to the measured sessions
+        warmup = SessionDriver(-1, random.Random(seed))
+        warmup.start()
+        warmup.run_round(0, batch_every=1)
+        del warmup
+        gc.collect()
+        baseline = resident_memory()
+
+        drivers = [SessionDriver(index, random.Random(seed * 1_000_003 + index)) for index in session_indices]
+        for driver in drivers:
+            driver.start()
+        memory = [resident_memory() - baseline]
+        for round_index in range(rounds):
+            for driver in drivers:
+                driver.run_round(round_index, batch_every)
+            memory.append(resident_memory() - baseline)
+
+    return {
+        "latencies": {action: [value for driver in drivers for value in driver.latencies[action]] for action in ACTIONS},
+        "conversions": sum(driver.conversions for driver in drivers),
+        "history": [driver.state_size() for driver in drivers],
+        "memory": memory,
+        "errors": [f"session {driver.index} {error}" for driver in drivers for error in driver.errors],
+    }
+
+
+def run_load_test(sessions, rounds, workers, batch_every, latency=0.0, tokens_per_second=0.0, seed=0):
+    """Drive sessions spread over worker processes; returns (metrics, memory growth per round, errors)"""
+    workers = max(min(workers, sessions), 1)
+    groups = [list(range(worker, sessions, workers)) for worker in range(workers)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        results = list(executor.map(
+            run_worker, groups, repeat(rounds), repeat(batch_every), repeat(latency), repeat(tokens_per_second), repeat(seed)
+        ))
+    elapsed = time.perf_counter() - start
+
+    latencies = {action: [value for result in results for value in result["latencies"][action]] for action in ACTIONS}
+    history = [entry for result in results for entry in result["history"]]
+    conversions = sum(result["conversions"] for result in results)
+    # Memory above each worker's warmed-up baseline, summed over workers, after first runs and each round
+    memory = [sum(values) for values in zip(*(result["memory"] for result in results))]
+    metrics = {
+        "conversions": conversions,
+        "conversions_per_second": conversions / elapsed if elapsed else 0.0,
+        "reruns_per_second": sum(len(latencies[action]) for action in ACTIONS) / elapsed if elapsed else 0.0,
+        "elapsed_seconds": elapsed,
+        "rss_per_session_bytes": memory[-1] / sessions,
+        "rss_growth_per_session_per_round_bytes": (memory[-1] - memory[0]) / sessions / rounds if rounds else 0.0,
+        "history_entries_per_session": sum(entries for entries, _ in history) / sessions,
+        "history_bytes_per_session": sum(size for _, size in history) / sessions,
+    }
+    for action, values in latencies.items():
+        if values:
+            for quantile in (0.5, 0.95, 0.99):
+                metrics[f"rerun_{action}_p{int(quantile * 100)}"] = percentile(values, quantile)
+    memory_samples = [
+        {"after": "first_run" if index == 0 else f"round_{index}", "rss_above_baseline_bytes": value}
+        for index, value in enumerate(memory)
+    ]
+    errors = [error for result in results for error in result["errors"]]
+    return metrics, memory_samples, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10, help="simulated concurrent sessions")
+    parser.add_argument("--rounds", type=int, default=3, help="paste/convert/reload rounds per session")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes; sessions in different workers rerun at the same time")
+    parser.add_argument("--batch-every", type=int, default=2, help="upload a batch every N rounds (0 = never)")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake model latency before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake model generation rate (0 = instant)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest_results.json", help="where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix="converter-loadtest-")
+    os.environ["CONVERSION_CACHE_DB"] = os.path.join(scratch, "cache.sqlite3")
+    os.environ["HISTORY_DB"] = os.path.join(scratch, "history.sqlite3")
+    os.environ["METRICS_FILE"] = os.path.join(scratch, "metrics.prom")
+
+    metrics, memory_samples, errors = run_load_test(
+        args.sessions, args.rounds, args.workers, args.batch_every, args.latency, args.tokens_per_second, args.seed
+    )
+
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "parameters": vars(args),
+        "metrics": metrics,
+        "memory": memory_samples,
+        "errors": errors,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, value in metrics.items():
+        if name.endswith("_bytes"):
+            print(f"{name:40} {value / 2 ** 20:12.2f} MiB")
+        elif "_p" in name and name.startswith("rerun_"):
+            print(f"{name:40} {value:12.4f} s")
+        else:
+            print(f"{name:40} {value:12.2f}")
+    for error in errors:
+        print(f"ERROR {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
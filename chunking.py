@@ -0,0 +1,264 @@
+import ast
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List
+
+DEFAULT_CHUNK_LINES = 200
+DEFAULT_CHUNK_WORKERS = 4
+
+# A unit whose checksum is divisible by this ends its chunk once the chunk holds half of max_lines
+CHUNK_BOUNDARY_MODULUS = 4
+
+BRACE_LANGUAGES = {
+    "javascript", "java", "c++", "c", "c#", "php", "go", "rust", "typescript",
+    "r", "perl", "kotlin", "swift", "scala", "dart"
+}
+
+# Lines that belong in the shared header (imports, includes, package declarations)
+HEADER_PATTERN = re.compile(
+    r"^\s*(import\b|from\s+\S+\s+import\b|#include\b|using\b|package\b|use\b|require(_relative)?\b|"
+    r"library\(|extern\s+crate\b|local\s+\w+\s*=\s*require\b|<\?php)"
+)
+
+# Top-level definition starts for languages structured by keywords and indentation
+DEFINITION_PATTERN = re.compile(
+    r"^(async\s+def|def|class|module|function|local\s+function|fn|sub)\b"
+)
+
+COMMENT_PREFIXES = ('#', '//', '/*', '*', '--')
+
+FENCE_PATTERN = re.compile(r"^\s*```")
+
+PRIVATE_DEFINITION_PATTERN = re.compile(r"^(async\s+)?(def|class|fn|func|function)\s+_(?!_)")
+
+# Languages where ' only delimits character literals; elsewhere in them it marks lifetimes ('a) or symbols
+CHAR_LITERAL_LANGUAGES = {"c", "c++", "java", "c#", "go", "rust", "kotlin", "scala"}
+CHAR_LITERAL = re.compile(r"'(\\[^'\n]{1,10}|[^\\'\n])'")
+
+# Languages whose comments start with # (and which have no // or /* */ comments)
+HASH_COMMENT_LANGUAGES = {"perl", "r", "ruby"}
+
+
+@dataclass
+class Chunk:
+    """A contiguous run of top-level units, converted as one prompt"""
+    index: int
+    start_line: int
+    end_line: int
+    code: str
+    signatures: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ChunkPlan:
+    """Chunks of one source file plus the header shared between them"""
+    header: List[str]
+    chunks: List[Chunk]
+
+    def context_for(self, chunk):
+        """Imports and the signatures defined outside chunk, for reference in its prompt"""
+        other_signatures = [
+            signature
+            for other in self.chunks if other.index != chunk.index
+            for signature in other.signatures
+        ]
+        return "\n".join(self.header + other_signatures)
+
+
+def _python_units(code, lines):
+    """Split Python at top-level statements using ast; returns (boundaries, signatures, header)"""
+    tree = ast.parse(code)
+    boundaries, signatures, header = [0], {}, []
+    previous_end = 0
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            header.extend(lines[node.lineno - 1:node.end_lineno])
+        if previous_end:
+            boundaries.append(previous_end)
+        previous_end = node.end_lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            unit_signatures = [lines[node.lineno - 1].strip()]
+            if isinstance(node, ast.ClassDef):
+                unit_signatures.extend(
+                    "    " + lines[child.lineno - 1].strip()
+                    for child in node.body
+                    if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                )
+            signatures[boundaries[-1]] = unit_signatures
+    return boundaries, signatures, header
+
+
+def _brace_delta(line, state, language=None):
+    """Net brace depth change of line, skipping strings and comments
+
+    state carries block comments and backtick strings (template literals, Go raw
+    strings) across lines.
+    """
+    delta, i, quote = 0, 0, state["quote"]
+    hash_comments = language in HASH_COMMENT_LANGUAGES
+    while i < len(line):
+        char, pair = line[i], line[i:i + 2]
+        if state["in_block_comment"]:
+            if pair == "*/":
+                state["in_block_comment"] = False
+                i += 1
+        elif quote:
+            # Go raw strings have no escapes
+            if char == "\\" and not (quote == "`" and language == "go"):
+                i += 1
+            elif char == quote:
+                quote = None
+        elif hash_comments and char == "#" and line[i - 1:i] != "$":
+            # Perl's $#array is the last index, not a comment
+            break
+        elif not hash_comments and pair == "//":
+            break
+        elif not hash_comments and pair == "/*":
+            state["in_block_comment"] = True
+            i += 1
+        elif char == "'" and language in CHAR_LITERAL_LANGUAGES:
+            literal = CHAR_LITERAL.match(line, i)
+            if literal:
+                i = literal.end() - 1
+        elif char in "\"'`":
+            quote = char
+        elif char == "{":
+            delta += 1
+        elif char == "}":
+            delta -= 1
+        i += 1
+    state["quote"] = quote if quote == "`" else None
+    return delta
+
+
+def _brace_units(lines, language=None):
+    """Split brace-delimited code where the brace depth returns to zero"""
+    boundaries, signatures = [0], {}
+    state = {"in_block_comment": False, "quote": None}
+    depth, opened, last_code_line = 0, False, None
+    for i, line in enumerate(lines):
+        delta = _brace_delta(line, state, language)
+        if depth == 0 and delta > 0 and not opened:
+            opened = True
+            signature = line.strip()
+            if signature.startswith("{") and last_code_line is not None:
+                signature = lines[last_code_line].strip()
+            signatures[boundaries[-1]] = [signature.rstrip("{").rstrip() + " { ... }"]
+        depth = max(depth + delta, 0)
+        if line.strip():
+            last_code_line = i
+        if opened and depth == 0:
+            boundaries.append(i + 1)
+            opened = False
+    if boundaries[-1] >= len(lines) or not any(line.strip() for line in lines[boundaries[-1]:]):
+        if len(boundaries) > 1:
+            boundaries.pop()
+    return boundaries, signatures
+
+
+def _indent_units(lines):
+    """Split at unindented definition keywords, attaching preceding comments to the definition"""
+    boundaries, signatures = [0], {}
+    for i, line in enumerate(lines):
+        if not DEFINITION_PATTERN.match(line):
+            continue
+        start = i
+        while start > boundaries[-1] and lines[start - 1].strip().startswith(COMMENT_PREFIXES):
+            start -= 1
+        if start > boundaries[-1]:
+            boundaries.append(start)
+        signatures[boundaries[-1]] = [line.strip()]
+    return boundaries, signatures
+
+
+def _is_cut_point(unit_lines):
+    """Content-defined chunk boundary, independent of where the unit sits in the file"""
+    return zlib.crc32('\n'.join(unit_lines).encode("utf-8")) % CHUNK_BOUNDARY_MODULUS == 0
+
+
+def plan_chunks(code, language, max_lines=DEFAULT_CHUNK_LINES):
+    """Split code at top-level definitions and pack the units into chunks of at most max_lines
+
+    Chunks end at units chosen by content, so editing a file only changes the chunks
+    around the edit and the others can be reused from the cache. A single unit larger
+    than max_lines is kept whole rather than cut mid-definition.
+    """
+    lines = code.split('\n')
+    header = None
+    boundaries = signatures = None
+    if language == "python":
+        try:
+            boundaries, signatures, header = _python_units(code, lines)
+        except SyntaxError:
+            pass
+    if boundaries is None:
+        if language in BRACE_LANGUAGES:
+            boundaries, signatures = _brace_units(lines, language)
+        else:
+            boundaries, signatures = _indent_units(lines)
+    if header is None:
+        header = [line for line in lines if HEADER_PATTERN.match(line)]
+
+    units = list(zip(boundaries, boundaries[1:] + [len(lines)]))
+    chunks, start, end, chunk_signatures = [], None, None, []
+    for unit_start, unit_end in units:
+        if start is not None and unit_end - start > max_lines:
+            chunks.append(Chunk(len(chunks), start, end, '\n'.join(lines[start:end]), chunk_signatures))
+            start, chunk_signatures = None, []
+        if start is None:
+            start = unit_start
+        end = unit_end
+        chunk_signatures = chunk_signatures + signatures.get(unit_start, [])
+        if end - start >= max_lines // 2 and _is_cut_point(lines[unit_start:unit_end]):
+            chunks.append(Chunk(len(chunks), start, end, '\n'.join(lines[start:end]), chunk_signatures))
+            start, chunk_signatures = None, []
+    if start is not None:
+        chunks.append(Chunk(len(chunks), start, end, '\n'.join(lines[start:end]), chunk_signatures))
+    return ChunkPlan(header=header, chunks=chunks)
+
+
+def extract_signatures(code, language):
+    """Signatures of the top-level definitions in code, skipping _private Python-style names"""
+    plan = plan_chunks(code, language, max_lines=code.count('\n') + 1)
+    return [
+        signature
+        for chunk in plan.chunks for signature in chunk.signatures
+        if not PRIVATE_DEFINITION_PATTERN.match(signature.strip())
+    ]
+
+
+def strip_code_fences(text):
+    """Remove a leading and trailing markdown fence from a model response"""
+    lines = text.strip('\n').split('\n')
+    if lines and FENCE_PATTERN.match(lines[0]):
+        lines = lines[1:]
+    if lines and FENCE_PATTERN.match(lines[-1]):
+        lines = lines[:-1]
+    return '\n'.join(lines)
+
+
+def convert_in_chunks(code, language, convert_chunk, max_lines=DEFAULT_CHUNK_LINES,
+                      max_workers=DEFAULT_CHUNK_WORKERS, on_progress=None):
+    """Convert code chunk by chunk in parallel and stitch the results back in source order
+
+    convert_chunk(chunk_code, context) converts one chunk; context holds the shared
+    imports and the signatures defined in other chunks. on_progress(done, total) is
+    called from the calling thread as chunks finish.
+    """
+    plan = plan_chunks(code, language, max_lines)
+    if len(plan.chunks) <= 1:
+        return convert_chunk(code, "")
+
+    outputs = [None] * len(plan.chunks)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(convert_chunk, chunk.code, plan.context_for(chunk)): chunk.index
+            for chunk in plan.chunks
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            outputs[futures[future]] = strip_code_fences(future.result())
+            if on_progress:
+                on_progress(done, len(plan.chunks))
+    return "\n\n".join(outputs)
@@ -0,0 +1,145 @@
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from batch import iter_batch_conversions, output_names, EXTENSION_LANGUAGES, FILE_EXTENSIONS, SKIPPED_DIRECTORIES, DEFAULT_BATCH_WORKERS
+from chunking import strip_code_fences
+from detection import detect_language
+from engine import ConversionEngine, ConversionOptions, OPTIMIZATION_LEVELS, create_cache, create_model, get_chunk_max_lines
+from project import convert_project, conversion_waves, find_dependencies, scan_project
+from report import build_report, summarize_report
+
+
+def collect_files(paths, target_lang):
+    """Expand files and directories into source files, skipping files already in the target language"""
+    target_extension = FILE_EXTENSIONS[target_lang]
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, directories, names in os.walk(path):
+            directories[:] = sorted(d for d in directories if d not in SKIPPED_DIRECTORIES and not d.startswith('.'))
+            for name in sorted(names):
+                extension = os.path.splitext(name)[1].lstrip('.').lower()
+                if extension in EXTENSION_LANGUAGES and extension != target_extension:
+                    yield os.path.join(root, name)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Convert source files between programming languages.")
+    parser.add_argument("paths", nargs="+", help="files or directories to convert")
+    parser.add_argument("--to", dest="target_lang", required=True, choices=sorted(FILE_EXTENSIONS), help="target language")
+    parser.add_argument("--from", dest="source_lang", choices=sorted(FILE_EXTENSIONS), help="source language (detected per file by default)")
+    parser.add_argument("--optimization", choices=OPTIMIZATION_LEVELS, default="Optimized")
+    parser.add_argument("--no-comments", action="store_true", help="remove comments from the output")
+    parser.add_argument("--error-handling", action="store_true", help="add error handling")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_MAX_WORKERS", DEFAULT_BATCH_WORKERS)),
+                        help="number of concurrent conversions")
+    parser.add_argument("--model", help="model name; overrides the MODEL_BACKENDS routing (defaults to CONVERTER_MODEL or gemini-2.5-flash)")
+    parser.add_argument("--overwrite", action="store_true", help="replace outputs that already exist")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the conversion cache")
+    parser.add_argument("--plan", action="store_true",
+                        help="print line, token and time estimates per language without converting anything")
+    parser.add_argument("--project", metavar="OUTPUT_DIR",
+                        help="convert one directory as a project into OUTPUT_DIR, dependencies first; "
+                             "rerun the same command to resume an interrupted run")
+    return parser
+
+
+def convert_project_tree(engine, options, args):
+    """--project mode: convert a source tree in dependency order with checkpointing"""
+    if len(args.paths) != 1 or not os.path.isdir(args.paths[0]):
+        print("--project takes a single directory", file=sys.stderr)
+        return 2
+    files = find_dependencies(scan_project(args.paths[0], args.target_lang, detect_language))
+    if not files:
+        print("Nothing to convert")
+        return 0
+    waves = conversion_waves(files)
+    print(f"{len(files)} files in {len(waves)} waves")
+
+    failures = resumed = 0
+    results = convert_project(
+        files, args.target_lang,
+        lambda code, source, target, context: engine.convert_in_context(code, source, target, options, context),
+        args.project, max_workers=args.workers, settings=repr(options)
+    )
+    for done, result in enumerate(results, start=1):
+        if not result.ok:
+            failures += 1
+            print(f"[{done}/{len(files)}] {result.name} failed: {result.error}", file=sys.stderr)
+        elif result.resumed:
+            resumed += 1
+        else:
+            print(f"[{done}/{len(files)}] wave {result.wave + 1}: {result.name} -> {result.output_name}")
+
+    print(f"{len(files) - failures} converted ({resumed} from checkpoint), {failures} failed")
+    return 1 if failures else 0
+
+
+def create_engine(args):
+    model = create_model(args.model) if args.model else None
+    return ConversionEngine(model=model, cache=None if args.no_cache else create_cache())
+
+
+def print_plan(files, target_lang, workers):
+    """--plan mode: estimates for the collected files, nothing is sent to the model"""
+    frame = build_report(files, target_lang, detect_language, chunk_lines=get_chunk_max_lines())
+    summary, wall_seconds = summarize_report(frame, workers=workers)
+    print(summary.to_string(float_format=lambda value: f"{value:.1f}"))
+    print(
+        f"{len(frame)} files, {int(frame['input_tokens'].sum())} input tokens, "
+        f"{int(frame['output_tokens'].sum())} output tokens, about {wall_seconds / 60:.1f} min with {workers} workers"
+    )
+    return 0
+
+
+def main(argv=None):
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+
+    options = ConversionOptions(args.optimization, not args.no_comments, args.error_handling)
+    if args.project:
+        return convert_project_tree(create_engine(args), options, args)
+
+    files = []
+    paths = list(dict.fromkeys(collect_files(args.paths, args.target_lang)))
+    outputs = output_names(paths, args.target_lang)
+    for path in paths:
+        output_path = outputs[path]
+        if os.path.exists(output_path) and not args.overwrite:
+            print(f"skip {path}: {output_path} exists")
+            continue
+        with open(path, encoding="utf-8", errors="replace") as f:
+            files.append((path, f.read()))
+
+    if not files:
+        print("Nothing to convert")
+        return 0
+    if args.plan:
+        return print_plan(files, args.target_lang, args.workers)
+
+    engine = create_engine(args)
+    failures = 0
+    results = iter_batch_conversions(
+        files, args.target_lang,
+        lambda code, source, target: engine.convert(code, source, target, options),
+        detect_language, max_workers=args.workers, source_lang=args.source_lang
+    )
+    for done, result in enumerate(results, start=1):
+        if result.ok:
+            with open(outputs[result.name], "w", encoding="utf-8") as f:
+                f.write(strip_code_fences(result.output) + "\n")
+            print(f"[{done}/{len(files)}] {result.name} ({result.source_lang}) -> {outputs[result.name]}")
+        else:
+            failures += 1
+            print(f"[{done}/{len(files)}] {result.name} failed: {result.error}", file=sys.stderr)
+
+    print(f"{len(files) - failures} converted, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
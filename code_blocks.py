@@ -0,0 +1,104 @@
+import re
+
+# An opening fence may carry a language tag; a closing fence is bare. Both may end in \r (CRLF replies)
+OPENING_FENCE = re.compile(r"^[ \t]*```[^`\n]*$")
+CLOSING_FENCE = re.compile(r"^[ \t]*```[ \t\r]*$")
+
+# Without an opening fence in this many characters, the reply is treated as bare code
+FENCE_SEARCH_LIMIT = 1000
+
+
+class CodeBlockExtractor:
+    """Incrementally extract the first fenced code block from streamed model output
+
+    feed() returns the code that can be shown so far and sets done once the closing
+    fence arrives, so the caller can stop reading the stream. Replies without an
+    opening fence near the start are passed through as they are.
+    """
+
+    def __init__(self, search_limit=FENCE_SEARCH_LIMIT):
+        self.search_limit = search_limit
+        self.done = False
+        self._state = "searching"
+        self._buffer = ""
+        # Line breaks are held back until more code follows, so none trail the block
+        self._newlines = 0
+
+    def feed(self, text):
+        """Add streamed text and return newly available code"""
+        if self.done:
+            return ""
+        self._buffer += text
+        if self._state == "searching":
+            return self._search()
+        if self._state == "raw":
+            output, self._buffer = self._buffer, ""
+            return output
+        return self._read_code()
+
+    def finish(self):
+        """Return whatever is still held back once the stream has ended"""
+        if self.done:
+            return ""
+        self.done = True
+        output, self._buffer = self._buffer, ""
+        if self._state == "searching":
+            return output.strip("\n")
+        if self._state == "code":
+            # A closing fence without a final line break is still a closing fence
+            if CLOSING_FENCE.match(output) or not output.strip():
+                return ""
+            return "\n" * self._newlines + output.rstrip()
+        return output
+
+    def _search(self):
+        position = 0
+        while position <= self.search_limit:
+            end = self._buffer.find("\n", position)
+            if end < 0:
+                break
+            if OPENING_FENCE.match(self._buffer[position:end]):
+                self._state = "code"
+                self._buffer = self._buffer[end + 1:]
+                return self._read_code()
+            position = end + 1
+        if len(self._buffer) > self.search_limit:
+            self._state = "raw"
+            output, self._buffer = self._buffer.lstrip("\n"), ""
+            return output
+        return ""
+
+    def _read_code(self):
+        output = []
+        position = 0
+        while True:
+            end = self._buffer.find("\n", position)
+            if end < 0:
+                break
+            # Code lines of CRLF replies come out with plain \n line breaks
+            line = self._buffer[position:end].rstrip("\r")
+            position = end + 1
+            if CLOSING_FENCE.match(line):
+                self.done = True
+                self._buffer = ""
+                return "".join(output)
+            if line:
+                output.append("\n" * self._newlines + line)
+                self._newlines = 0
+            self._newlines += 1
+        partial = self._buffer[position:]
+        # Hold back a partial line only while it could still become the closing fence
+        if partial.strip(" \t\r").strip("`"):
+            # A trailing \r may be the first half of a CRLF line break
+            shown = partial.rstrip("\r")
+            output.append("\n" * self._newlines + shown)
+            self._newlines = 0
+            partial = partial[len(shown):]
+        self._buffer = partial
+        return "".join(output)
+
+
+def extract_code_block(text):
+    """The first fenced code block of a complete reply, or the reply itself if it has none"""
+    extractor = CodeBlockExtractor()
+    return extractor.feed(text) + extractor.finish()
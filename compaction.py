@@ -0,0 +1,110 @@
+import re
+from functools import lru_cache
+
+from analysis import CHARS_PER_TOKEN
+
+DEFAULT_MAX_INPUT_TOKENS = 1_000_000
+DEFAULT_MAX_OUTPUT_TOKENS = 65_536
+
+# Converted code usually runs somewhat longer than its source
+OUTPUT_EXPANSION = 1.5
+
+C_FAMILY = {"javascript", "java", "c++", "c", "c#", "go", "rust", "typescript", "kotlin", "swift", "scala", "dart", "php"}
+HASH_COMMENT_LANGUAGES = {"python", "ruby", "perl", "r"}
+
+# String literals, which are copied verbatim; single- and double-quoted strings end at the line
+QUOTED_STRINGS = [r'"(?:\\.|[^"\\\n])*"', r"'(?:\\.|[^'\\\n])*'"]
+TRIPLE_QUOTED = {
+    "python": [r'"""(?:\\.|[^\\])*?"""', r"'''(?:\\.|[^\\])*?'''"],
+    "dart": [r'"""(?:\\.|[^\\])*?"""', r"'''(?:\\.|[^\\])*?'''"],
+    "kotlin": [r'"""[\s\S]*?"""'],
+    "swift": [r'"""(?:\\.|[^\\])*?"""'],
+    "scala": [r'"""[\s\S]*?"""'],
+}
+BACKTICK_LANGUAGES = {"javascript", "typescript", "go"}
+
+
+class TokenBudgetExceeded(ValueError):
+    """The input cannot be converted within the model's context or output limit"""
+
+
+def _string_patterns(language):
+    patterns = list(TRIPLE_QUOTED.get(language, []))
+    if language in BACKTICK_LANGUAGES:
+        patterns.append(r"`(?:\\.|[^`\\])*`")
+    return patterns + QUOTED_STRINGS
+
+
+def _comment_patterns(language):
+    patterns = []
+    if language in C_FAMILY:
+        patterns += [r"/\*[\s\S]*?\*/", r"//[^\n]*"]
+    if language == "php":
+        patterns.append(r"#(?!\[)[^\n]*")
+    elif language == "perl":
+        patterns.append(r"(?<!\$)#[^\n]*")
+    elif language in HASH_COMMENT_LANGUAGES:
+        patterns.append(r"#[^\n]*")
+    elif language == "lua":
+        patterns += [r"--\[\[[\s\S]*?\]\]", r"--[^\n]*"]
+    return patterns
+
+
+@lru_cache(maxsize=None)
+def _compiled(language):
+    """(comment pattern or None, whitespace pattern); strings are matched first so their contents are kept"""
+    strings = "|".join(f"(?:{pattern})" for pattern in _string_patterns(language))
+    comments = _comment_patterns(language)
+    comment_pattern = None
+    if comments:
+        comment = "|".join(comments)
+        # A line holding only a comment is removed together with its line break
+        comment_pattern = re.compile(f"({strings})|^[ \\t]*(?:{comment})[ \\t]*(?:\\n|$)|(?:{comment})", re.MULTILINE)
+    whitespace_pattern = re.compile(f"({strings})|[ \\t]+(?=\\n|$)|\\n(?:[ \\t]*\\n)+")
+    return comment_pattern, whitespace_pattern
+
+
+def strip_comments(code, language):
+    """Remove comments from code, leaving string literals intact; unknown languages are returned unchanged"""
+    comment_pattern, _ = _compiled(language)
+    if comment_pattern is None:
+        return code
+    return comment_pattern.sub(lambda match: match.group(1) or "", code)
+
+
+def collapse_whitespace(code, language):
+    """Drop trailing whitespace and squeeze runs of blank lines into one, outside string literals"""
+    _, whitespace_pattern = _compiled(language)
+
+    def replace(match):
+        if match.group(1) is not None:
+            return match.group(1)
+        return "\n\n" if match.group(0).count("\n") > 1 else ("\n" if match.group(0).startswith("\n") else "")
+
+    return whitespace_pattern.sub(replace, code).strip("\n")
+
+
+def compact_code(code, language, keep_comments=True):
+    """Shrink code before it is sent to the model without changing what it does"""
+    if not keep_comments:
+        code = strip_comments(code, language)
+    return collapse_whitespace(code, language)
+
+
+def estimate_tokens(text):
+    """Rough token count of text"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def check_token_budget(prompt, code, max_input_tokens=DEFAULT_MAX_INPUT_TOKENS, max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS):
+    """Raise TokenBudgetExceeded if prompt, or the converted code expected from code, will not fit"""
+    prompt_tokens = estimate_tokens(prompt)
+    if prompt_tokens > max_input_tokens:
+        raise TokenBudgetExceeded(f"Prompt is about {prompt_tokens} tokens; the model accepts {max_input_tokens}")
+    output_tokens = int(estimate_tokens(code) * OUTPUT_EXPANSION)
+    if output_tokens > max_output_tokens:
+        raise TokenBudgetExceeded(
+            f"Converted code would be about {output_tokens} tokens; the model returns at most {max_output_tokens}. "
+            "Split the input into smaller definitions."
+        )
+    return prompt_tokens
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_DB = os.path.join(".cache", "conversions.sqlite3")
+DEFAULT_DISK_ENTRIES = 20000
+
+
+def normalize_code(code):
+    """Normalize code so cosmetic whitespace differences share a cache entry"""
+    lines = code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+def make_cache_key(
+    code, source_lang, target_lang, optimization_level, include_comments, add_error_handling,
+    prompt=None, template="", model="", pipeline_version=0
+):
+    """Build a content-addressed key from the normalized code, every prompt option, the prompt and the model
+
+    prompt names a prompt other than the whole-file one, e.g. "chunk", so its entries do not collide.
+    template is the prompt's text and pipeline_version the version of the output processing;
+    changing either, or the model, stops earlier entries from being served.
+    """
+    fields = {
+        "code": normalize_code(code),
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "optimization_level": optimization_level,
+        "include_comments": bool(include_comments),
+        "add_error_handling": bool(add_error_handling),
+        "template": hashlib.sha256(template.encode("utf-8")).hexdigest(),
+        "model": model,
+        "pipeline_version": pipeline_version,
+    }
+    if prompt:
+        fields["prompt"] = prompt
+    payload = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ConversionCache:
+    """Two-tier conversion cache: bounded in-memory LRU in front of a bounded SQLite store
+
+    The SQLite tier keeps the max_disk_entries most recently used entries, and drops
+    entries unused for max_age seconds when max_age is set.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, db_path=DEFAULT_CACHE_DB, max_disk_entries=DEFAULT_DISK_ENTRIES,
+                 max_age=None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.max_age = max_age
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # Guards the SQLite connection; lookups in the memory tier never wait on it
+        self._db_lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "writes": 0}
+        self._db = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversions ("
+                "key TEXT PRIMARY KEY, output BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(conversions)")]
+            if "accessed_at" not in columns:
+                # Stores created before the disk tier was bounded; their entries are pruned first
+                self._db.execute("ALTER TABLE conversions ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS conversions_accessed ON conversions (accessed_at)")
+            self._db.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _oldest_fresh(self, now):
+        return now - self.max_age if self.max_age else 0
+
+    def get(self, key):
+        """Return the cached output for key, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return self._memory[key]
+
+        value = None
+        if self._db is not None:
+            now = time.time()
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT output FROM conversions WHERE key = ? AND accessed_at >= ?", (key, self._oldest_fresh(now))
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE conversions SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+            if row is not None:
+                value = zlib.decompress(row[0]).decode("utf-8")
+
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._remember(key, value)
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            return value
+
+    def set(self, key, value):
+        """Store an output in both tiers, pruning the disk tier to its limits"""
+        with self._lock:
+            self._remember(key, value)
+            self._stats["writes"] += 1
+        if self._db is None:
+            return
+        compressed = zlib.compress(value.encode("utf-8"))
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversions (key, output, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, compressed, now, now)
+            )
+            self._db.execute("DELETE FROM conversions WHERE accessed_at < ?", (self._oldest_fresh(now),))
+            self._db.execute(
+                "DELETE FROM conversions WHERE key NOT IN "
+                "(SELECT key FROM conversions ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_disk_entries,)
+            )
+            self._db.commit()
+
+    def clear(self):
+        """Drop every cached entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM conversions")
+                self._db.commit()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        if self._db is not None:
+            with self._db_lock:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM conversions").fetchone()[0]
+        else:
+            stats["disk_entries"] = 0
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0
+        return stats
@@ -0,0 +1,175 @@
+import re
+from functools import lru_cache
+
+# Only this many leading characters are scanned; language signals show up early
+DEFAULT_DETECTION_PREFIX = 32 * 1024
+
+# A pattern contributes at most this many hits to a language's score
+MAX_HITS_PER_PATTERN = 5
+
+# Minimum winning score before a language is reported instead of "unknown"
+MIN_DETECTION_SCORE = 3
+
+# Case-sensitive regexes with weights per language; stronger signals weigh more
+LANGUAGE_PATTERNS = {
+    "python": [
+        (r"^[ \t]*def \w+\(.*\)\s*(->.*)?:", 4), (r"^[ \t]*elif\b", 3), (r"^[ \t]*from [\w.]+ import\b", 3),
+        (r"\bself\.", 2), (r"if __name__ == ['\"]__main__['\"]", 6), (r"\bprint\(", 1), (r"\bNone\b", 1),
+        (r"^[ \t]*class \w+(\(.*\))?:\s*$", 3), (r"\blambda\b[^:\n]*:", 1), (r"^import (numpy|pandas)\b", 4),
+        # Short snippets: top-level imports of plain modules and print calls
+        (r"^import \w+( as \w+)?(, ?\w+( as \w+)?)*[ \t]*$", 3), (r"^print\(", 2),
+    ],
+    "javascript": [
+        (r"\bfunction\s*\w*\s*\(", 2), (r"\bconst \w+\s*=", 1), (r"\blet \w+\s*=", 1), (r"=>", 1),
+        (r"console\.log\(", 4), (r"\bdocument\.", 3), (r"\brequire\(['\"]", 3), (r"\bmodule\.exports\b", 5),
+        (r"===", 2), (r"\bexport default\b", 2), (r"\bimport .* from ['\"]", 2), (r"\$\.ajax\(", 4),
+    ],
+    "typescript": [
+        (r"\binterface \w+\s*\{", 3), (r":\s*(string|number|boolean|any|void)\b", 4), (r"^[ \t]*type \w+\s*=", 3),
+        (r"\bexport (const|function|class|interface)\b", 1), (r"\bimport .* from ['\"]", 2), (r"\bconst \w+\s*=", 1),
+        (r"=>", 1), (r"===", 2),
+    ],
+    "java": [
+        (r"\bpublic (static )?(final )?class \w+", 4), (r"\bpublic static void main\(String\[\] \w+\)", 6),
+        (r"System\.out\.print", 6), (r"^import java\.", 6), (r"\bString\[\]", 3), (r"@Override\b", 3),
+        (r"^package [\w.]+;", 3),
+    ],
+    "c++": [
+        (r"#include <(iostream|vector|string|map|algorithm|memory)>", 5), (r"\bstd::", 4), (r"\busing namespace\b", 4),
+        (r"\bcout\s*<<", 4), (r"\bcin\s*>>", 4), (r"\btemplate\s*<", 3), (r"\bint main\(", 2), (r"#include \"", 2),
+    ],
+    "c": [
+        (r"#include <(stdio|stdlib|string|math)\.h>", 5), (r"\bprintf\(", 2), (r"\bscanf\(", 3), (r"\bmalloc\(", 3),
+        (r"\bint main\(", 2), (r"#include \"", 2),
+    ],
+    "c#": [
+        (r"^using System", 6), (r"\bnamespace \w+", 2), (r"Console\.Write(Line)?\(", 6), (r"\bstatic void Main\(", 5),
+        (r"\{ get; set; \}", 5),
+    ],
+    "php": [
+        (r"<\?php", 10), (r"\$\w+\s*=", 2), (r"\becho\b", 2), (r"\$_(GET|POST|SERVER|SESSION)\b", 6),
+        (r"\bfunction \w+\(\$", 5),
+    ],
+    "go": [
+        (r"^package \w+\s*$", 3), (r"\bfunc \w*\s*\(", 4), (r"\bfunc main\(\)", 5), (r"\bfmt\.\w+", 6), (r":=", 3),
+        (r"\bgo func\b", 5), (r"^import \($", 3), (r"\bchan\b", 2),
+    ],
+    "rust": [
+        (r"\bfn \w+\s*(<.*>)?\(", 4), (r"\blet mut\b", 5), (r"\bprintln!\(", 6), (r"^use \w+(::\w+)+", 5),
+        (r"\bimpl\b", 3), (r"\bVec(::|<)", 4), (r"&mut\b|&str\b", 3), (r"\bpub fn\b", 5), (r"\blet \w+\s*=", 1),
+    ],
+    "r": [
+        (r" <- function\(", 8), (r"\blibrary\(", 5), (r"\bdata\.frame\(", 5), (r"\bggplot\(", 5), (r"<-", 2),
+        (r"\bc\(", 1),
+    ],
+    "perl": [
+        (r"^use strict;", 8), (r"^use warnings;", 8), (r"\bmy \$\w+", 6), (r"\bmy @\w+", 6), (r"\bsub \w+\s*\{", 5),
+        (r"=~ ?[ms]?/", 4), (r"\$\w+\s*=", 1),
+    ],
+    "lua": [
+        (r"\blocal function\b", 8), (r"\blocal \w+\s*=", 4), (r"\bthen\b", 2), (r"~=", 4), (r"pairs\(", 6),
+        (r"^[ \t]*--", 2), (r"^[ \t]*end\s*$", 1),
+    ],
+    "kotlin": [
+        (r"\bfun \w+\(", 5), (r"\bval \w+\s*[:=]", 3), (r"\bvar \w+\s*:", 2), (r"\bprintln\(", 2),
+        (r"\bdata class\b", 6), (r"\bwhen\s*\(", 3), (r"\boverride fun\b", 6),
+    ],
+    "swift": [
+        (r"\bfunc \w+\s*\(", 3), (r"\bimport (UIKit|Foundation|SwiftUI)\b", 8), (r"\blet \w+\s*:\s*\w+", 2),
+        (r"\bguard\b", 4), (r"->\s*\w+\s*\{", 2), (r"\\\(", 5),
+    ],
+    "ruby": [
+        (r"^[ \t]*def \w+[?!]?(\(.*\))?\s*$", 3), (r"^[ \t]*end\s*$", 2), (r"\bputs\b", 5), (r"\brequire ['\"]", 4),
+        (r"\battr_(accessor|reader|writer)\b", 7), (r"\.each do\b", 6), (r"\bdo \|\w+(, ?\w+)*\|", 6), (r"\belsif\b", 4),
+    ],
+    "scala": [
+        (r"\bobject \w+", 4), (r"\bdef \w+(\[.*\])?\(.*\)\s*:\s*\w+.*=", 6), (r"\bcase class\b", 7),
+        (r"\bval \w+", 2), (r"\bimport scala\.", 8), (r"\bextends App\b", 6), (r"\bimplicit\b", 5),
+    ],
+    "dart": [
+        (r"\bvoid main\(\)\s*\{", 3), (r"\bimport 'package:", 9), (r"\bfinal \w+ = ", 2), (r"\bWidget build\(", 8),
+        (r"\bsetState\(", 5), (r"\bFuture<", 3),
+    ],
+}
+
+
+# Leading anchors are checked outside the regex so each pattern starts with a literal
+# and the regex engine can use its fast literal-prefix search
+_ANCHORS = ((r"^[ \t]*", "indent"), ("^", "line"), (r"\b", "word"))
+
+
+def _build_signals(language_patterns):
+    """Compile each distinct pattern once; identical patterns share their hits between languages"""
+    weights = {}
+    for language, patterns in language_patterns.items():
+        for pattern, weight in patterns:
+            weights.setdefault(pattern, []).append((language, weight))
+
+    signals = []
+    for pattern, pattern_weights in weights.items():
+        anchor = None
+        for prefix, name in _ANCHORS:
+            if pattern.startswith(prefix):
+                pattern, anchor = pattern[len(prefix):], name
+                break
+        signals.append((re.compile(pattern, re.MULTILINE), anchor, pattern_weights))
+    return signals
+
+
+_SIGNALS = _build_signals(LANGUAGE_PATTERNS)
+
+
+def _anchor_matches(text, start, anchor):
+    if anchor == "word":
+        return start == 0 or not (text[start - 1].isalnum() or text[start - 1] == '_')
+    line_start = text.rfind('\n', 0, start) + 1
+    if anchor == "line":
+        return start == line_start
+    if anchor == "indent":
+        return not text[line_start:start].strip(' \t')
+    return True
+
+
+def _prefix(code, max_chars):
+    """Bound the scanned text, cutting at a line break so line-anchored patterns stay valid"""
+    if len(code) <= max_chars:
+        return code
+    cut = code.rfind('\n', 0, max_chars)
+    return code[:cut if cut > 0 else max_chars]
+
+
+@lru_cache(maxsize=64)
+def _score_text(text):
+    scores = dict.fromkeys(LANGUAGE_PATTERNS, 0)
+    for regex, anchor, pattern_weights in _SIGNALS:
+        hits = 0
+        for match in regex.finditer(text):
+            if _anchor_matches(text, match.start(), anchor):
+                hits += 1
+                if hits == MAX_HITS_PER_PATTERN:
+                    break
+        for language, weight in pattern_weights:
+            scores[language] += weight * hits
+    return scores
+
+
+def detect_language_scores(code, max_chars=DEFAULT_DETECTION_PREFIX):
+    """Weighted pattern scores for every language over a bounded prefix of the code"""
+    if not code or not code.strip():
+        return dict.fromkeys(LANGUAGE_PATTERNS, 0)
+    return dict(_score_text(_prefix(code, max_chars)))
+
+
+def detect_language_with_confidence(code, max_chars=DEFAULT_DETECTION_PREFIX):
+    """Return (language, confidence) where confidence is the winner's share of all scores"""
+    scores = detect_language_scores(code, max_chars)
+    language = max(scores, key=scores.get)
+    total = sum(scores.values())
+    if scores[language] < MIN_DETECTION_SCORE:
+        return "unknown", 0.0
+    return language, scores[language] / total
+
+
+def detect_language(code, max_chars=DEFAULT_DETECTION_PREFIX):
+    """Detect the most likely language of code, or "unknown\""""
+    return detect_language_with_confidence(code, max_chars)[0]
@@ -0,0 +1,544 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from chunking import convert_in_chunks, DEFAULT_CHUNK_LINES, DEFAULT_CHUNK_WORKERS
+from code_blocks import CodeBlockExtractor, extract_code_block
+from compaction import (
+    check_token_budget, compact_code, estimate_tokens,
+    DEFAULT_MAX_INPUT_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS, OUTPUT_EXPANSION
+)
+from conversion_cache import ConversionCache, make_cache_key, DEFAULT_CACHE_SIZE, DEFAULT_CACHE_DB, DEFAULT_DISK_ENTRIES
+from metrics import add_timing
+from profiling import Profiler
+from resilience import ResiliencePolicy
+from routing import Backend, ModelRouter
+from singleflight import SingleFlight
+from startup import lazy_import
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+DEFAULT_FAN_OUT_WORKERS = 4
+
+OPTIMIZATION_LEVELS = ["Basic", "Optimized", "Highly Optimized"]
+
+# Bump when input compaction or output post-processing changes what a conversion returns
+# for the same prompt; 2: compacted inputs (compaction) and extracted code blocks (code_blocks)
+OUTPUT_PIPELINE_VERSION = 2
+
+CONVERSION_PROMPT = PromptTemplate(
+    template=(
+        "Convert the following code from {source_lang} to {target_lang}. "
+        "Optimization level: {optimization_level}. "
+        "{comments_instruction}"
+        "{error_handling_instruction}"
+        "\n\nOriginal code:\n```{source_lang}\n{programme}\n```\n\n"
+        "Converted code:\n"
+    ),
+    input_variables=['programme', 'source_lang', 'target_lang', 'optimization_level', 'comments_instruction', 'error_handling_instruction']
+)
+
+CHUNK_PROMPT = PromptTemplate(
+    template=(
+        "Convert the following fragment of a larger file from {source_lang} to {target_lang}. "
+        "Optimization level: {optimization_level}. "
+        "{comments_instruction}"
+        "{error_handling_instruction}"
+        "\nThe shared context lists imports and signatures defined elsewhere in the file. "
+        "Use it for reference only: do not convert or repeat it, and output only the converted fragment."
+        "\n\nShared context:\n```{source_lang}\n{context}\n```\n\n"
+        "Fragment:\n```{source_lang}\n{programme}\n```\n\n"
+        "Converted fragment:\n"
+    ),
+    input_variables=['programme', 'context', 'source_lang', 'target_lang', 'optimization_level', 'comments_instruction', 'error_handling_instruction']
+)
+
+PROJECT_PROMPT = PromptTemplate(
+    template=(
+        "Convert the following file of a larger project from {source_lang} to {target_lang}. "
+        "Optimization level: {optimization_level}. "
+        "{comments_instruction}"
+        "{error_handling_instruction}"
+        "\nThe files it depends on have already been converted; their public {target_lang} signatures are listed below. "
+        "Refer to them by these names and signatures, and do not repeat them."
+        "\n\nDependencies:\n```{target_lang}\n{context}\n```\n\n"
+        "Original code:\n```{source_lang}\n{programme}\n```\n\n"
+        "Converted code:\n"
+    ),
+    input_variables=['programme', 'context', 'source_lang', 'target_lang', 'optimization_level', 'comments_instruction', 'error_handling_instruction']
+)
+
+
+@dataclass(frozen=True)
+class ConversionOptions:
+    """Prompt options that shape a conversion"""
+    optimization_level: str = "Optimized"
+    include_comments: bool = True
+    add_error_handling: bool = False
+
+
+@dataclass
+class TargetResult:
+    """Outcome of converting one input into one of several target languages"""
+    target_lang: str
+    output: Optional[str] = None
+    error: Optional[str] = None
+    from_cache: bool = False
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def create_model(model_name=None, temperature=0, api_key=None, timeout=None):
+    """Create the chat model used for conversions; the Gemini client is imported on first use
+
+    The client's own retries are disabled and its requests time out with each
+    attempt (MODEL_TIMEOUT), so the resilience layer is the only retry policy.
+    """
+    credentials = {"google_api_key": api_key} if api_key else {}
+    return lazy_import("langchain_google_genai").ChatGoogleGenerativeAI(
+        model=model_name or os.getenv("CONVERTER_MODEL", DEFAULT_MODEL),
+        temperature=temperature,
+        max_retries=0,
+        timeout=timeout or ResiliencePolicy.from_env().timeout,
+        **credentials
+    )
+
+
+def _create_fake_model(model=None, api_key=None, **settings):
+    from fake_llm import FakeChatModel
+    return FakeChatModel(**settings)
+
+
+# Model factories for MODEL_BACKENDS entries, by "provider"; add an entry to plug in another backend type
+MODEL_PROVIDERS = {
+    "google": lambda model=None, api_key=None: create_model(model, api_key=api_key),
+    "fake": _create_fake_model,
+}
+
+
+def create_backend(spec, resilience=None):
+    """Build a routing backend from a MODEL_BACKENDS entry
+
+    Routing keys are name, provider, min_input_tokens, max_input_tokens and
+    api_key_env (the variable holding the key); the rest go to the provider's factory.
+    """
+    settings = dict(spec)
+    name = settings.pop("name")
+    provider = settings.pop("provider", "google")
+    min_input_tokens = settings.pop("min_input_tokens", 0)
+    max_input_tokens = settings.pop("max_input_tokens", None)
+    api_key_env = settings.pop("api_key_env", None)
+    if api_key_env:
+        settings["api_key"] = os.environ[api_key_env]
+    if provider not in MODEL_PROVIDERS:
+        raise ValueError(f"Unknown model provider {provider!r} for backend {name!r}")
+    return Backend(
+        name, MODEL_PROVIDERS[provider](**settings), min_input_tokens, max_input_tokens,
+        policy=resilience or ResiliencePolicy.from_env()
+    )
+
+
+def create_router(resilience=None):
+    """Model router configured from the environment
+
+    MODEL_BACKENDS holds a JSON list of backend entries (see create_backend).
+    Otherwise GOOGLE_API_KEYS, a comma-separated list, gives one default-model
+    backend per key, and without either a single default backend is used.
+    """
+    backends = os.getenv("MODEL_BACKENDS")
+    if backends:
+        return ModelRouter([create_backend(spec, resilience) for spec in json.loads(backends)])
+    keys = [key.strip() for key in os.getenv("GOOGLE_API_KEYS", "").split(",") if key.strip()]
+    if keys:
+        return ModelRouter([
+            Backend(f"key-{index}", create_model(api_key=key), policy=resilience or ResiliencePolicy.from_env())
+            for index, key in enumerate(keys, start=1)
+        ])
+    return ModelRouter([Backend("default", create_model(), policy=resilience or ResiliencePolicy.from_env())])
+
+
+def get_chunk_max_lines():
+    """Inputs longer than this many lines are converted in chunks"""
+    return int(os.getenv("CHUNK_MAX_LINES", DEFAULT_CHUNK_LINES))
+
+
+def get_token_budget():
+    """(max prompt tokens, max output tokens) of the configured model"""
+    return (
+        int(os.getenv("MODEL_MAX_INPUT_TOKENS", DEFAULT_MAX_INPUT_TOKENS)),
+        int(os.getenv("MODEL_MAX_OUTPUT_TOKENS", DEFAULT_MAX_OUTPUT_TOKENS))
+    )
+
+
+def build_conversion_inputs(code, source_lang, target_lang, options):
+    """Build the prompt variables for one conversion; the code is compacted, dropping comments that will not be kept"""
+    return {
+        'programme': compact_code(code, source_lang, keep_comments=options.include_comments),
+        'source_lang': source_lang,
+        'target_lang': target_lang,
+        'optimization_level': options.optimization_level,
+        'comments_instruction': "Preserve all comments." if options.include_comments else "Remove all comments.",
+        'error_handling_instruction': "Add error handling." if options.add_error_handling else ""
+    }
+
+
+def add_usage(timings, message):
+    """Accumulate token counts from a model message's usage metadata"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        add_timing(timings, 'input_tokens', usage.get("input_tokens", 0))
+        add_timing(timings, 'output_tokens', usage.get("output_tokens", 0))
+
+
+def make_history_item(code, result, source_lang, target_lang, **extra):
+    """Build a conversion history record"""
+    return {
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'input': code,
+        'output': result,
+        'from_lang': source_lang,
+        'to_lang': target_lang,
+        **extra
+    }
+
+
+class ConversionEngine:
+    """Prompt construction, model calls, chunking and caching, independent of any UI"""
+
+    def __init__(self, model=None, parser=None, cache=None, pack=None, resilience=None, router=None, profiler=None):
+        # Picks a backend per call; each backend applies deadlines, retries, hedging and circuit breaking
+        if router is None:
+            router = (
+                ModelRouter([Backend("default", model, policy=resilience or ResiliencePolicy.from_env())])
+                if model is not None else create_router(resilience)
+            )
+        self.router = router
+        # Part of every cache key, so switching models does not serve the old model's output
+        self.model_name = ",".join(router.model_names())
+        self.parser = parser if parser is not None else StrOutputParser()
+        self.cache = cache
+        # Read-only pretranslations (see translation_pack), keyed like the cache
+        self.pack = pack or {}
+        # Identical conversions in flight at the same time share one model call
+        self.flights = SingleFlight()
+        # Profiles uncached conversions when PROFILE is set or a call passes profile=True; a no-op otherwise
+        self.profiler = profiler or Profiler.from_env()
+
+    def _call(self, prompt_template, inputs, timings=None):
+        """Format the prompt, call the model and parse the reply, timing each stage"""
+        start = time.perf_counter()
+        prompt = prompt_template.invoke(inputs)
+        add_timing(timings, 'prompt_format', time.perf_counter() - start)
+        prompt_tokens = check_token_budget(prompt.to_string(), inputs['programme'], *get_token_budget())
+
+        start = time.perf_counter()
+        message = self.router.invoke(prompt, prompt_tokens)
+        add_timing(timings, 'model_latency', time.perf_counter() - start)
+        add_usage(timings, message)
+
+        start = time.perf_counter()
+        text = extract_code_block(self.parser.invoke(message))
+        add_timing(timings, 'output_parse', time.perf_counter() - start)
+        return text
+
+    async def _acall(self, prompt_template, inputs, timings=None):
+        start = time.perf_counter()
+        prompt = await prompt_template.ainvoke(inputs)
+        add_timing(timings, 'prompt_format', time.perf_counter() - start)
+        prompt_tokens = check_token_budget(prompt.to_string(), inputs['programme'], *get_token_budget())
+
+        start = time.perf_counter()
+        # The resilient callers run attempts in threads so they can enforce deadlines and hedge
+        message = await asyncio.to_thread(self.router.invoke, prompt, prompt_tokens)
+        add_timing(timings, 'model_latency', time.perf_counter() - start)
+        add_usage(timings, message)
+
+        start = time.perf_counter()
+        text = extract_code_block(await self.parser.ainvoke(message))
+        add_timing(timings, 'output_parse', time.perf_counter() - start)
+        return text
+
+    def cache_key(self, code, source_lang, target_lang, options, prompt=None):
+        # Project prompts are named after their context, "project-<hash>"
+        template = CHUNK_PROMPT if prompt == "chunk" else PROJECT_PROMPT if prompt else CONVERSION_PROMPT
+        return make_cache_key(
+            code, source_lang, target_lang,
+            options.optimization_level, options.include_comments, options.add_error_handling,
+            prompt=prompt, template=template.template, model=self.model_name, pipeline_version=OUTPUT_PIPELINE_VERSION
+        )
+
+    def cached(self, code, source_lang, target_lang, options=None):
+        """Return a pretranslated or cached conversion, or None"""
+        key = self.cache_key(code, source_lang, target_lang, options or ConversionOptions())
+        if key in self.pack:
+            return self.pack[key]
+        if self.cache is None:
+            return None
+        return self.cache.get(key)
+
+    def remember(self, code, source_lang, target_lang, options, result):
+        """Store a finished conversion in the cache"""
+        if self.cache is not None:
+            self.cache.set(self.cache_key(code, source_lang, target_lang, options or ConversionOptions()), result)
+
+    def needs_chunking(self, code):
+        """Whether code is too long, in lines or in expected output tokens, for a single call"""
+        if code.count('\n') + 1 > get_chunk_max_lines():
+            return True
+        return estimate_tokens(code) * OUTPUT_EXPANSION > get_token_budget()[1]
+
+    def chunk_max_lines(self, code):
+        """Chunk size in lines, shrunk below CHUNK_MAX_LINES when long lines would overflow the output budget"""
+        line_count = code.count('\n') + 1
+        tokens_per_line = estimate_tokens(code) * OUTPUT_EXPANSION / line_count
+        return max(min(get_chunk_max_lines(), int(get_token_budget()[1] / tokens_per_line)), 1)
+
+    def run(self, code, source_lang, target_lang, options=None, on_progress=None, timings=None, profile=False):
+        """Convert without consulting the cache, chunking large inputs
+
+        timings, if given, is filled with per-stage seconds and token counts. profile
+        profiles this conversion even when PROFILE is not set.
+        """
+        options = options or ConversionOptions()
+        with self.profiler.run("convert", enabled=profile):
+            start = time.perf_counter()
+            if self.needs_chunking(code):
+                result = self.run_chunked(code, source_lang, target_lang, options, on_progress, timings)
+            else:
+                result = self._call(CONVERSION_PROMPT, build_conversion_inputs(code, source_lang, target_lang, options), timings)
+            add_timing(timings, 'generation_time', time.perf_counter() - start)
+        return result
+
+    def run_shared(self, code, source_lang, target_lang, options=None, on_progress=None, timings=None, profile=False):
+        """Run and cache a conversion, sharing one model call among concurrent identical requests
+
+        A request that waited on another's call gets 'coalesced' and its wait as
+        'generation_time' in timings, instead of stage times.
+        """
+        options = options or ConversionOptions()
+
+        def run():
+            result = self.run(code, source_lang, target_lang, options, on_progress, timings, profile)
+            self.remember(code, source_lang, target_lang, options, result)
+            return result
+
+        start = time.perf_counter()
+        result, coalesced = self.flights.do(self.cache_key(code, source_lang, target_lang, options), run)
+        if coalesced:
+            add_timing(timings, 'coalesced', 1)
+            add_timing(timings, 'generation_time', time.perf_counter() - start)
+        return result
+
+    def run_chunked(self, code, source_lang, target_lang, options=None, on_progress=None, timings=None):
+        """Convert a large input chunk by chunk in parallel and stitch the results in order
+
+        Each chunk's translation is cached on its own, so re-converting an edited file only
+        sends the chunks that changed. timings counts 'chunks' and 'reused_chunks'.
+        """
+        options = options or ConversionOptions()
+
+        def convert_chunk(chunk_code, context):
+            add_timing(timings, 'chunks', 1)
+            key = self.cache_key(chunk_code, source_lang, target_lang, options, prompt="chunk")
+            text = self.cache.get(key) if self.cache is not None else None
+            if text is not None:
+                add_timing(timings, 'reused_chunks', 1)
+                return text
+            inputs = build_conversion_inputs(chunk_code, source_lang, target_lang, options)
+            text = self._call(CHUNK_PROMPT, {**inputs, 'context': context}, timings)
+            if self.cache is not None:
+                self.cache.set(key, text)
+            return text
+
+        return convert_in_chunks(
+            code, source_lang, convert_chunk,
+            max_lines=self.chunk_max_lines(code),
+            max_workers=int(os.getenv("CHUNK_MAX_WORKERS", DEFAULT_CHUNK_WORKERS)),
+            on_progress=on_progress
+        )
+
+    def stream(self, code, source_lang, target_lang, options=None, timings=None, profile=False):
+        """Yield converted code chunks as the model produces them, caching the result
+
+        A request identical to one already in flight waits for it and yields its whole
+        result at once. Time spent by the consumer between chunks is excluded from
+        model_latency, but is part of the profile when the stream is profiled.
+        """
+        options = options or ConversionOptions()
+        key = self.cache_key(code, source_lang, target_lang, options)
+        while True:
+            call, leader = self.flights.begin(key)
+            if leader:
+                break
+            result = self.flights.wait(call)
+            if not call.abandoned:
+                add_timing(timings, 'coalesced', 1)
+                yield result
+                return
+
+        parts = []
+        try:
+            with self.profiler.run("convert", enabled=profile):
+                for text in self._stream_model(code, source_lang, target_lang, options, timings):
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            self.flights.finish(key, call, error=e)
+            raise
+        except BaseException:
+            # The consumer stopped early; a waiting request takes over
+            self.flights.finish(key, call, abandoned=True)
+            raise
+        result = "".join(parts)
+        self.remember(code, source_lang, target_lang, options, result)
+        self.flights.finish(key, call, result)
+
+    def _stream_model(self, code, source_lang, target_lang, options, timings):
+        start = time.perf_counter()
+        inputs = build_conversion_inputs(code, source_lang, target_lang, options)
+        prompt = CONVERSION_PROMPT.invoke(inputs)
+        add_timing(timings, 'prompt_format', time.perf_counter() - start)
+        prompt_tokens = check_token_budget(prompt.to_string(), inputs['programme'], *get_token_budget())
+
+        chunks = self.router.stream(prompt, prompt_tokens)
+        extractor = CodeBlockExtractor()
+        waited, first = 0.0, True
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            elapsed = time.perf_counter() - start
+            waited += elapsed
+            add_timing(timings, 'model_latency', elapsed)
+            if chunk is None:
+                text = extractor.finish()
+                if text:
+                    yield text
+                return
+            if first:
+                add_timing(timings, 'time_to_first_token', waited)
+                first = False
+            add_usage(timings, chunk)
+
+            start = time.perf_counter()
+            text = extractor.feed(self.parser.invoke(chunk))
+            add_timing(timings, 'output_parse', time.perf_counter() - start)
+            if text:
+                yield text
+            if extractor.done:
+                # Stop generation: trailing prose after the code block is neither awaited nor paid for
+                chunks.close()
+                return
+
+    def convert(self, code, source_lang, target_lang, options=None, on_progress=None, timings=None, profile=False):
+        """Convert code, serving repeated requests from the cache"""
+        options = options or ConversionOptions()
+        result = self.cached(code, source_lang, target_lang, options)
+        if result is None:
+            result = self.run_shared(code, source_lang, target_lang, options, on_progress, timings, profile)
+        return result
+
+    def convert_in_context(self, code, source_lang, target_lang, options=None, context="", timings=None, profile=False):
+        """Convert one file of a project, given the converted signatures of its dependencies
+
+        Without context this is convert(). Inputs too large for one call are chunked
+        without the dependency context.
+        """
+        options = options or ConversionOptions()
+        if not context or self.needs_chunking(code):
+            return self.convert(code, source_lang, target_lang, options, timings=timings, profile=profile)
+        prompt = f"project-{hashlib.sha256(context.encode('utf-8')).hexdigest()}"
+        key = self.cache_key(code, source_lang, target_lang, options, prompt=prompt)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return cached
+        inputs = build_conversion_inputs(code, source_lang, target_lang, options)
+        with self.profiler.run("convert", enabled=profile):
+            start = time.perf_counter()
+            result = self._call(PROJECT_PROMPT, {**inputs, 'context': context}, timings)
+            add_timing(timings, 'generation_time', time.perf_counter() - start)
+        if self.cache is not None:
+            self.cache.set(key, result)
+        return result
+
+    def convert_targets(self, code, source_lang, target_langs, options=None, max_workers=None, profile=False):
+        """Convert code into several languages concurrently, yielding a TargetResult as each finishes
+
+        Every target has its own cache entry, so the wall-clock time is close to that of
+        the slowest uncached target.
+        """
+        options = options or ConversionOptions()
+        max_workers = max_workers or int(os.getenv("FAN_OUT_MAX_WORKERS", DEFAULT_FAN_OUT_WORKERS))
+
+        def convert_target(target_lang):
+            result = self.cached(code, source_lang, target_lang, options)
+            if result is not None:
+                return TargetResult(target_lang, result, from_cache=True)
+            timings = {}
+            result = self.run_shared(code, source_lang, target_lang, options, timings=timings, profile=profile)
+            return TargetResult(target_lang, result, timings=timings)
+
+        with ThreadPoolExecutor(max_workers=max(min(max_workers, len(target_langs)), 1)) as executor:
+            futures = {executor.submit(convert_target, target_lang): target_lang for target_lang in target_langs}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield TargetResult(futures[future], error=str(e))
+
+    async def aconvert(self, code, source_lang, target_lang, options=None, timings=None):
+        """Async variant of convert"""
+        options = options or ConversionOptions()
+        result = self.cached(code, source_lang, target_lang, options)
+        if result is None:
+            start = time.perf_counter()
+            if self.needs_chunking(code):
+                result = await asyncio.to_thread(self.run_chunked, code, source_lang, target_lang, options, None, timings)
+            else:
+                result = await self._acall(
+                    CONVERSION_PROMPT, build_conversion_inputs(code, source_lang, target_lang, options), timings
+                )
+            add_timing(timings, 'generation_time', time.perf_counter() - start)
+            self.remember(code, source_lang, target_lang, options, result)
+        return result
+
+
+_default_engine = None
+
+
+def create_cache():
+    """Conversion cache configured from the environment"""
+    return ConversionCache(
+        max_entries=int(os.getenv("CONVERSION_CACHE_SIZE", DEFAULT_CACHE_SIZE)),
+        db_path=os.getenv("CONVERSION_CACHE_DB", DEFAULT_CACHE_DB),
+        max_disk_entries=int(os.getenv("CONVERSION_CACHE_DISK_SIZE", DEFAULT_DISK_ENTRIES)),
+        max_age=float(os.getenv("CONVERSION_CACHE_TTL", 0)) or None
+    )
+
+
+def get_default_engine():
+    """Engine backed by the default model and the shared on-disk cache"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = ConversionEngine(cache=create_cache())
+    return _default_engine
+
+
+def convert(code, source_lang, target_lang, options=None):
+    """Convert code with the default engine"""
+    return get_default_engine().convert(code, source_lang, target_lang, options)
+
+
+async def aconvert(code, source_lang, target_lang, options=None):
+    """Convert code asynchronously with the default engine"""
+    return await get_default_engine().aconvert(code, source_lang, target_lang, options)
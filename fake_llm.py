@@ -0,0 +1,81 @@
+import random
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_CODE_BLOCK = re.compile(r"```([^\n`]*)\n(.*?)\n```", re.DOTALL)
+_TARGET = re.compile(r" to (\S+?)\. ")
+_TOKEN = re.compile(r"\S+\s*|\s+")
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic local stand-in for the Gemini chat model
+
+    The response echoes the last code block of the prompt inside a fence tagged with
+    the target language. latency delays the first token, tokens_per_second paces the
+    rest, and error_rate makes a seeded fraction of calls raise. tail_rate adds
+    tail_latency to a seeded fraction of calls, for exercising timeouts and hedging.
+    """
+
+    latency: float = 0.0
+    tail_rate: float = 0.0
+    tail_latency: float = 0.0
+    tokens_per_second: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+    response: Optional[str] = None
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        self.calls += 1
+        if self.error_rate and random.Random(self.seed + self.calls).random() < self.error_rate:
+            raise RuntimeError("fake model error")
+        if self.response is not None:
+            return self.response
+        prompt = "\n".join(str(message.content) for message in messages)
+        blocks = _CODE_BLOCK.findall(prompt)
+        code = blocks[-1][1] if blocks else prompt
+        target = _TARGET.search(prompt)
+        return f"```{target.group(1) if target else ''}\n{code}\n```"
+
+    def _delay(self) -> float:
+        if self.tail_rate and random.Random(f"tail-{self.seed}-{self.calls}").random() < self.tail_rate:
+            return self.latency + self.tail_latency
+        return self.latency
+
+    def _usage(self, messages: List[BaseMessage], text: str) -> dict:
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = len(text) // 4
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        text = self._respond(messages)
+        time.sleep(self._delay())
+        if self.tokens_per_second:
+            time.sleep(len(_TOKEN.findall(text)) / self.tokens_per_second)
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text = self._respond(messages)
+        time.sleep(self._delay())
+        tokens = _TOKEN.findall(text)
+        for index, token in enumerate(tokens):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            chunk = AIMessageChunk(content=token)
+            if index == len(tokens) - 1:
+                chunk = AIMessageChunk(content=token, usage_metadata=self._usage(messages, text))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,82 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+DEFAULT_HISTORY_DB = os.path.join(".cache", "history.sqlite3")
+DEFAULT_MAX_PER_SESSION = 100
+DEFAULT_MAX_TOTAL = 10000
+
+# Keys stored as compressed bodies; everything else in a history item is metadata
+BODY_KEYS = ('input', 'output')
+
+
+class HistoryStore:
+    """SQLite-backed conversion history with zlib-compressed bodies and size caps
+
+    Sessions keep only the metadata returned by add(); input and output bodies are
+    fetched on demand with get().
+    """
+
+    def __init__(self, db_path=DEFAULT_HISTORY_DB, max_per_session=DEFAULT_MAX_PER_SESSION, max_total=DEFAULT_MAX_TOTAL):
+        self.max_per_session = max_per_session
+        self.max_total = max_total
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, input BLOB NOT NULL, output BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS history_session ON history (session_id, id)")
+        self._db.commit()
+
+    def add(self, session_id, item):
+        """Store a history item and return its metadata, including the new id"""
+        metadata = {key: value for key, value in item.items() if key not in BODY_KEYS}
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO history (session_id, metadata, input, output) VALUES (?, ?, ?, ?)",
+                (
+                    session_id, json.dumps(metadata),
+                    zlib.compress(item['input'].encode("utf-8")),
+                    zlib.compress(item['output'].encode("utf-8"))
+                )
+            )
+            self._db.execute(
+                "DELETE FROM history WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM history WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_per_session)
+            )
+            self._db.execute(
+                "DELETE FROM history WHERE id NOT IN (SELECT id FROM history ORDER BY id DESC LIMIT ?)",
+                (self.max_total,)
+            )
+            self._db.commit()
+        return {'id': cursor.lastrowid, **metadata}
+
+    def get(self, session_id, item_id):
+        """Return a session's full history item with its bodies, or None if it was evicted"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT metadata, input, output FROM history WHERE id = ? AND session_id = ?", (item_id, session_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': item_id,
+            **json.loads(row[0]),
+            'input': zlib.decompress(row[1]).decode("utf-8"),
+            'output': zlib.decompress(row[2]).decode("utf-8")
+        }
+
+    def clear(self, session_id):
+        """Delete every history item of a session"""
+        with self._lock:
+            self._db.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+            self._db.commit()
@@ -0,0 +1,107 @@
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+DEFAULT_JOB_WORKERS = 4
+DEFAULT_MAX_FINISHED_JOBS = 1000
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class Job:
+    """One background conversion and its outcome"""
+    id: str
+    code: str
+    source_lang: str
+    target_lang: str
+    options: object
+    status: str = QUEUED
+    output: Optional[str] = None
+    error: Optional[str] = None
+    from_cache: bool = False
+    timings: dict = field(default_factory=dict)
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class JobQueue:
+    """Process-wide worker pool running conversions in the background
+
+    submit() returns a job id at once; callers poll get() for the job's status. Only
+    the most recent max_finished finished jobs are kept.
+    """
+
+    def __init__(self, engine, max_workers=None, max_finished=DEFAULT_MAX_FINISHED_JOBS):
+        self.engine = engine
+        self.max_workers = max_workers or int(os.getenv("JOB_MAX_WORKERS", DEFAULT_JOB_WORKERS))
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="conversion-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._counters = {"submitted": 0, "done": 0, "failed": 0, "peak_queued": 0}
+        self._sequence = itertools.count()
+
+    def submit(self, code, source_lang, target_lang, options):
+        """Queue a conversion and return its job id"""
+        job = Job(f"{next(self._sequence)}-{uuid.uuid4().hex[:8]}", code, source_lang, target_lang, options)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._counters["submitted"] += 1
+            queued = sum(1 for queued_job in self._jobs.values() if queued_job.status == QUEUED)
+            self._counters["peak_queued"] = max(self._counters["peak_queued"], queued)
+        self._executor.submit(self._run, job)
+        return job.id
+
+    def _run(self, job):
+        with self._lock:
+            job.status, job.started_at = RUNNING, time.time()
+        try:
+            # One cache lookup per job; convert() would look the key up again after a miss
+            output = self.engine.cached(job.code, job.source_lang, job.target_lang, job.options)
+            job.from_cache = output is not None
+            if output is None:
+                output = self.engine.run_shared(job.code, job.source_lang, job.target_lang, job.options, timings=job.timings)
+        except Exception as e:
+            self._finish(job, FAILED, error=str(e))
+        else:
+            self._finish(job, DONE, output=output)
+
+    def _finish(self, job, status, output=None, error=None):
+        with self._lock:
+            job.output, job.error = output, error
+            job.status, job.finished_at = status, time.time()
+            self._counters[status] += 1
+            del self._jobs[job.id]
+            self._finished[job.id] = job
+            while len(self._finished) > self.max_finished:
+                self._finished.popitem(last=False)
+
+    def get(self, job_id):
+        """The job with this id, or None once it has been evicted"""
+        with self._lock:
+            return self._jobs.get(job_id) or self._finished.get(job_id)
+
+    def stats(self):
+        """Queue depth, running jobs and lifetime counters"""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "queued": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+            "workers": self.max_workers,
+        }
@@ -0,0 +1,195 @@
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_METRICS_FILE = os.path.join(".cache", "metrics.prom")
+DEFAULT_METRICS_WINDOW = 1000
+# Minimum seconds between rewrites of the export file
+DEFAULT_EXPORT_INTERVAL = 5.0
+
+# Per-conversion stage timings, in seconds
+STAGES = ("prompt_format", "time_to_first_token", "model_latency", "output_parse", "render", "generation_time")
+TOKEN_KEYS = ("input_tokens", "output_tokens")
+QUANTILES = (0.5, 0.95, 0.99)
+
+_timings_lock = threading.Lock()
+
+
+def add_timing(timings, key, value):
+    """Accumulate a value into a timings dict that may be shared by worker threads"""
+    if timings is None:
+        return
+    with _timings_lock:
+        timings[key] = timings.get(key, 0) + value
+
+
+def percentile(values, quantile):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(quantile * len(ordered)) - 1, 0)]
+
+
+class MetricsRegistry:
+    """Process-wide rolling window of per-conversion timings with Prometheus text export"""
+
+    def __init__(self, window=DEFAULT_METRICS_WINDOW, export_path=DEFAULT_METRICS_FILE, export_interval=DEFAULT_EXPORT_INTERVAL):
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self._lock = threading.Lock()
+        # Serializes exports, so a slower writer cannot replace the file with an older snapshot
+        self._export_lock = threading.Lock()
+        self._last_export = float("-inf")
+        self._export_timer = None
+        self._samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self._totals = {stage: [0.0, 0] for stage in STAGES}
+        self._counters = {
+            "conversions": 0, "cached_conversions": 0, "coalesced_conversions": 0, "input_tokens": 0, "output_tokens": 0
+        }
+        self._gauges = {}
+
+    def register_gauge(self, name, help_text, read):
+        """Export read() as a gauge, evaluated whenever the metrics are rendered"""
+        self._gauges[name] = (help_text, read)
+
+    def record(self, timings, cached=False):
+        """Add one conversion's timings and token counts and schedule a refresh of the export file
+
+        A conversion that shared another request's model call has 'coalesced' in timings.
+        """
+        with self._lock:
+            if cached:
+                self._counters["cached_conversions"] += 1
+            elif timings.get('coalesced'):
+                self._counters["coalesced_conversions"] += 1
+            else:
+                self._counters["conversions"] += 1
+            for stage in STAGES:
+                if stage in timings:
+                    self._samples[stage].append(timings[stage])
+                    self._totals[stage][0] += timings[stage]
+                    self._totals[stage][1] += 1
+            for key in TOKEN_KEYS:
+                self._counters[key] += int(timings.get(key, 0))
+        if self.export_path:
+            self._schedule_export()
+
+    def _schedule_export(self):
+        """Export now if the last export is export_interval old, otherwise once it is due"""
+        with self._lock:
+            if self._export_timer is not None:
+                return
+            delay = self._last_export + self.export_interval - time.monotonic()
+            if delay > 0:
+                self._export_timer = threading.Timer(delay, self._export_due)
+                self._export_timer.daemon = True
+                self._export_timer.start()
+                return
+            self._last_export = time.monotonic()
+        self._export_quietly()
+
+    def _export_due(self):
+        with self._lock:
+            self._export_timer = None
+            self._last_export = time.monotonic()
+        self._export_quietly()
+
+    def _export_quietly(self):
+        try:
+            self.export()
+        except OSError:
+            # The file is a convenience copy; a failed write must not fail the conversion
+            pass
+
+    def output_tokens_per_second(self):
+        """Measured model output rate over all recorded conversions, or None before any"""
+        with self._lock:
+            latency, output_tokens = self._totals["model_latency"][0], self._counters["output_tokens"]
+        return output_tokens / latency if latency > 0 and output_tokens > 0 else None
+
+    def summary(self):
+        """p50/p95/p99 and sample count per stage over the rolling window"""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        return {
+            stage: {**{f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES}, "count": len(values)}
+            for stage, values in samples.items() if values
+        }
+
+    def to_prometheus(self):
+        """Render the registry in the Prometheus text exposition format"""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+            totals = {stage: tuple(total) for stage, total in self._totals.items()}
+            counters = dict(self._counters)
+
+        lines = [
+            "# HELP code_converter_stage_seconds Conversion stage latency in seconds",
+            "# TYPE code_converter_stage_seconds summary",
+        ]
+        for stage in STAGES:
+            for quantile in QUANTILES:
+                value = f"{percentile(samples[stage], quantile):.6f}" if samples[stage] else "NaN"
+                lines.append(f'code_converter_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value}')
+            lines.append(f'code_converter_stage_seconds_sum{{stage="{stage}"}} {totals[stage][0]:.6f}')
+            lines.append(f'code_converter_stage_seconds_count{{stage="{stage}"}} {totals[stage][1]}')
+        lines += [
+            "# HELP code_converter_conversions_total Conversions served, by source",
+            "# TYPE code_converter_conversions_total counter",
+            f'code_converter_conversions_total{{source="model"}} {counters["conversions"]}',
+            f'code_converter_conversions_total{{source="cache"}} {counters["cached_conversions"]}',
+            f'code_converter_conversions_total{{source="coalesced"}} {counters["coalesced_conversions"]}',
+            "# HELP code_converter_tokens_total Model tokens, by direction",
+            "# TYPE code_converter_tokens_total counter",
+            f'code_converter_tokens_total{{direction="input"}} {counters["input_tokens"]}',
+            f'code_converter_tokens_total{{direction="output"}} {counters["output_tokens"]}',
+        ]
+        for name, (help_text, read) in list(self._gauges.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Atomically rewrite the export file"""
+        directory = os.path.dirname(self.export_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A temporary file per writer, so concurrent exports from other sessions or processes do not collide
+        with self._export_lock:
+            descriptor, temporary = tempfile.mkstemp(dir=directory or ".", prefix=f".{os.path.basename(self.export_path)}.")
+            try:
+                with os.fdopen(descriptor, "w") as f:
+                    f.write(self.to_prometheus())
+                # mkstemp creates the file private; scrapers running as other users must be able to read it
+                os.chmod(temporary, 0o644)
+                os.replace(temporary, self.export_path)
+            except BaseException:
+                os.remove(temporary)
+                raise
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics over HTTP from a daemon thread and return the server"""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,192 @@
+import contextlib
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+DEFAULT_PROFILE_DIR = os.path.join(".cache", "profiles")
+DEFAULT_PROFILE_KEEP = 50
+# Functions and allocation sites kept in each run's summary
+TOP_ENTRIES = 25
+
+# Returned when profiling is off, so a disabled hook costs one method call
+_DISABLED = contextlib.nullcontext()
+# Run numbers, unique per process even across profilers sharing a directory
+_sequence = itertools.count()
+
+
+class Profiler:
+    """Opt-in cProfile and tracemalloc profiling of app reruns and conversions
+
+    Each profiled run writes a pstats file and a JSON summary (slowest functions and
+    top allocation sites) into directory, which keeps only the newest keep runs.
+    tracemalloc is process-wide, so the allocations of runs overlapping in other
+    threads are included. From Python 3.12 only one cProfile profiler can be active
+    per process; a run starting while another is profiled goes unprofiled.
+    """
+
+    def __init__(self, directory=DEFAULT_PROFILE_DIR, keep=DEFAULT_PROFILE_KEEP, enabled=False):
+        self.directory = directory
+        self.keep = keep
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tracing = 0
+        self._owns_tracing = False
+
+    @classmethod
+    def from_env(cls):
+        """Profiler configured from PROFILE, PROFILE_DIR and PROFILE_KEEP"""
+        return cls(
+            directory=os.getenv("PROFILE_DIR", DEFAULT_PROFILE_DIR),
+            keep=int(os.getenv("PROFILE_KEEP", DEFAULT_PROFILE_KEEP)),
+            enabled=os.getenv("PROFILE", "0").lower() in ("1", "true", "yes"),
+        )
+
+    def run(self, label, enabled=False):
+        """Context manager profiling its body when the profiler or the caller enables it
+
+        A run nested in another profiled run on the same thread is part of the outer profile.
+        """
+        if not (self.enabled or enabled) or getattr(self._local, "active", False):
+            return _DISABLED
+        return self._profile(label)
+
+    def _start_tracing(self):
+        with self._lock:
+            if self._tracing == 0:
+                # Leave tracing started by someone else (e.g. python -X tracemalloc) running
+                self._owns_tracing = not tracemalloc.is_tracing()
+                if self._owns_tracing:
+                    tracemalloc.start()
+            self._tracing += 1
+
+    def _stop_tracing(self):
+        with self._lock:
+            self._tracing -= 1
+            if self._tracing == 0 and self._owns_tracing:
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def _profile(self, label):
+        self._local.active = True
+        try:
+            run = self._begin()
+            try:
+                yield
+            finally:
+                # Reruns end with streamlit's control-flow exceptions; those runs are kept too
+                if run is not None:
+                    self._end(label, *run)
+        finally:
+            self._local.active = False
+
+    def _begin(self):
+        """Start tracing and profiling; None if another profiler is active (Python 3.12+)"""
+        self._start_tracing()
+        try:
+            before = tracemalloc.take_snapshot()
+            profile = cProfile.Profile()
+            started, start = time.time(), time.perf_counter()
+            profile.enable()
+        except ValueError:
+            self._stop_tracing()
+            return None
+        except BaseException:
+            self._stop_tracing()
+            raise
+        return profile, before, started, start
+
+    def _end(self, label, profile, before, started, start):
+        profile.disable()
+        seconds = time.perf_counter() - start
+        try:
+            after = tracemalloc.take_snapshot()
+        finally:
+            self._stop_tracing()
+        try:
+            self._write(label, started, seconds, profile, before, after)
+        except OSError:
+            # Profiles are diagnostics; failing to write one must not fail the run
+            pass
+
+    def _write(self, label, started, seconds, profile, before, after):
+        stats = pstats.Stats(profile)
+        functions = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:TOP_ENTRIES]
+        ignored = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+        allocations = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+        summary = {
+            "label": label,
+            "started": started,
+            "seconds": seconds,
+            "functions": [
+                {
+                    "function": pstats.func_std_string(pstats.func_strip_path(function)),
+                    "calls": calls,
+                    "own_seconds": own_seconds,
+                    "cumulative_seconds": cumulative_seconds,
+                }
+                for function, (_, calls, own_seconds, cumulative_seconds, _) in functions
+            ],
+            "allocations": [
+                {
+                    "site": f"{os.path.basename(allocation.traceback[0].filename)}:{allocation.traceback[0].lineno}",
+                    "kib": allocation.size_diff / 1024,
+                    "blocks": allocation.count_diff,
+                }
+                for allocation in allocations[:TOP_ENTRIES] if allocation.size_diff > 0
+            ],
+        }
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started))
+        name = f"{stamp}-{os.getpid()}-{next(_sequence):06d}-{label}"
+        os.makedirs(self.directory, exist_ok=True)
+        summary["pstats"] = os.path.join(self.directory, f"{name}.prof")
+        stats.dump_stats(summary["pstats"])
+        path = os.path.join(self.directory, f"{name}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(summary, f)
+        os.replace(f"{path}.tmp", path)
+        self._rotate()
+
+    def _runs(self):
+        """Summary file names, oldest first"""
+        try:
+            return sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def _rotate(self):
+        with self._lock:
+            runs = self._runs()
+            for name in runs[:max(len(runs) - self.keep, 0)]:
+                for path in (name, f"{name[:-len('.json')]}.prof"):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(os.path.join(self.directory, path))
+
+    def recent_runs(self, limit=10):
+        """Summaries of the newest runs, newest first"""
+        runs = []
+        for name in reversed(self._runs()[-limit:]):
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    runs.append(json.load(f))
+            except FileNotFoundError:
+                # Rotated away by another process
+                continue
+        return runs
+
+
+def slowest_functions(runs, limit=TOP_ENTRIES):
+    """Functions by cumulative time summed over run summaries, slowest first"""
+    totals = {}
+    for run in runs:
+        for entry in run["functions"]:
+            total = totals.setdefault(entry["function"], {"function": entry["function"], "runs": 0, "calls": 0, "cumulative_seconds": 0.0})
+            total["runs"] += 1
+            total["calls"] += entry["calls"]
+            total["cumulative_seconds"] += entry["cumulative_seconds"]
+    return sorted(totals.values(), key=lambda total: -total["cumulative_seconds"])[:limit]
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Optional
+
+from batch import output_names, BatchResult, EXTENSION_LANGUAGES, FILE_EXTENSIONS, SKIPPED_DIRECTORIES, DEFAULT_BATCH_WORKERS
+from chunking import extract_signatures, strip_code_fences
+
+CHECKPOINT_FILE = ".conversion-checkpoint.jsonl"
+
+PYTHON_IMPORT = re.compile(r"^\s*import\s+([\w.]+(?:\s*,\s*[\w.]+)*)", re.MULTILINE)
+PYTHON_FROM_IMPORT = re.compile(r"^\s*from\s+(\.*)([\w.]*)\s+import\s+(?:\(([^)]*)\)|([\w \t,*]+))", re.MULTILINE)
+SCRIPT_IMPORT = re.compile(
+    r"""(?:\bfrom\s*|\bimport\s*|\brequire\(\s*|\bimport\(\s*)['"](\.{1,2}/[^'"]+)['"]"""
+)
+SCRIPT_EXTENSIONS = ("", ".js", ".jsx", ".mjs", ".ts", ".tsx", "/index.js", "/index.ts")
+INCLUDE = re.compile(r'^\s*#\s*include\s*"([^"]+)"', re.MULTILINE)
+DOTTED_IMPORT = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+)", re.MULTILINE)
+RUBY_REQUIRE = re.compile(r"""^\s*require_relative\s*\(?\s*['"]([^'"]+)['"]""", re.MULTILINE)
+
+DOTTED_IMPORT_LANGUAGES = {"java", "kotlin", "scala", "dart"}
+
+
+@dataclass
+class ProjectFile:
+    """One source file of a project, with the project files it imports"""
+    path: str
+    source_lang: str
+    code: str
+    dependencies: set = field(default_factory=set)
+
+
+@dataclass
+class ProjectResult(BatchResult):
+    """Outcome of converting one project file; resumed results come from the checkpoint"""
+    wave: int = 0
+    resumed: bool = False
+    signatures: list = field(default_factory=list)
+    # Set by convert_project, which keeps files sharing a stem (foo.c, foo.h) apart
+    output_file: Optional[str] = None
+
+    @property
+    def output_name(self):
+        return self.output_file or super().output_name
+
+
+def scan_project(root, target_lang, detect_fn=None):
+    """Read every source file under root that is not already in the target language
+
+    Paths are relative to root with forward slashes. The language comes from the
+    extension, falling back to detect_fn for ambiguous ones.
+    """
+    target_extension = FILE_EXTENSIONS[target_lang]
+    files = {}
+    for directory, directories, names in os.walk(root):
+        directories[:] = sorted(d for d in directories if d not in SKIPPED_DIRECTORIES and not d.startswith('.'))
+        for name in sorted(names):
+            extension = os.path.splitext(name)[1].lstrip('.').lower()
+            if extension not in EXTENSION_LANGUAGES or extension == target_extension:
+                continue
+            full_path = os.path.join(directory, name)
+            with open(full_path, encoding="utf-8", errors="replace") as f:
+                code = f.read()
+            source_lang = EXTENSION_LANGUAGES[extension]
+            if extension == "h" and detect_fn is not None and detect_fn(code) == "c++":
+                source_lang = "c++"
+            path = os.path.relpath(full_path, root).replace(os.sep, "/")
+            files[path] = ProjectFile(path, source_lang, code)
+    return files
+
+
+def _python_dependencies(project_file, paths):
+    directory = posixpath.dirname(project_file.path)
+    modules = []
+    for match in PYTHON_IMPORT.finditer(project_file.code):
+        modules.extend(("", name.strip()) for name in match.group(1).split(","))
+    for match in PYTHON_FROM_IMPORT.finditer(project_file.code):
+        dots, module, parenthesized, names = match.groups()
+        names = parenthesized or names
+        if dots:
+            base = directory
+            for _ in range(len(dots) - 1):
+                base = posixpath.dirname(base)
+        else:
+            base = ""
+        modules.append((base, module))
+        # "from package import module" imports a submodule
+        for name in names.split(","):
+            if name.strip():
+                name = name.split()[0]
+                modules.append((base, f"{module}.{name}" if module else name))
+    for base, module in modules:
+        if not module or module.endswith("*"):
+            continue
+        module_path = posixpath.join(base, module.replace(".", "/"))
+        # Absolute imports may also be relative to the importing file's directory
+        prefixes = [module_path] if base else [module_path, posixpath.join(directory, module_path)]
+        for prefix in prefixes:
+            for candidate in (f"{prefix}.py", f"{prefix}/__init__.py"):
+                if candidate in paths:
+                    yield candidate
+
+
+def _script_dependencies(project_file, paths):
+    directory = posixpath.dirname(project_file.path)
+    for match in SCRIPT_IMPORT.finditer(project_file.code):
+        target = posixpath.normpath(posixpath.join(directory, match.group(1)))
+        for extension in SCRIPT_EXTENSIONS:
+            if target + extension in paths:
+                yield target + extension
+                break
+
+
+def _include_dependencies(project_file, paths):
+    directory = posixpath.dirname(project_file.path)
+    for match in INCLUDE.finditer(project_file.code):
+        for candidate in (posixpath.normpath(posixpath.join(directory, match.group(1))), posixpath.normpath(match.group(1))):
+            if candidate in paths:
+                yield candidate
+                break
+
+
+def _dotted_dependencies(project_file, modules):
+    for match in DOTTED_IMPORT.finditer(project_file.code):
+        module = match.group(1).replace(".", "/")
+        for suffix in (module, posixpath.dirname(module)):
+            if suffix in modules:
+                yield modules[suffix]
+                break
+
+
+def _ruby_dependencies(project_file, paths):
+    directory = posixpath.dirname(project_file.path)
+    for match in RUBY_REQUIRE.finditer(project_file.code):
+        target = posixpath.normpath(posixpath.join(directory, match.group(1)))
+        for candidate in (target, f"{target}.rb"):
+            if candidate in paths:
+                yield candidate
+                break
+
+
+def find_dependencies(files):
+    """Fill in each file's dependencies on other project files from its imports
+
+    Python, JavaScript/TypeScript, C/C++ includes, JVM-style dotted imports and
+    Ruby require_relative are resolved; other languages get no edges.
+    """
+    paths = set(files)
+    # JVM imports name classes, which may live in any source root: index by every path suffix
+    modules = {}
+    for path in paths:
+        parts = os.path.splitext(path)[0].split("/")
+        for start in range(len(parts)):
+            modules.setdefault("/".join(parts[start:]), path)
+    for project_file in files.values():
+        language = project_file.source_lang
+        if language == "python":
+            dependencies = _python_dependencies(project_file, paths)
+        elif language in ("javascript", "typescript"):
+            dependencies = _script_dependencies(project_file, paths)
+        elif language in ("c", "c++"):
+            dependencies = _include_dependencies(project_file, paths)
+        elif language in DOTTED_IMPORT_LANGUAGES:
+            dependencies = _dotted_dependencies(project_file, modules)
+        elif language == "ruby":
+            dependencies = _ruby_dependencies(project_file, paths)
+        else:
+            dependencies = ()
+        project_file.dependencies = set(dependencies) - {project_file.path}
+    return files
+
+
+def conversion_waves(files):
+    """Group files into waves so every file comes after the files it depends on
+
+    Files in a wave are independent of each other. Files in import cycles go into
+    one last wave together.
+    """
+    remaining = {path: set(project_file.dependencies) for path, project_file in files.items()}
+    waves = []
+    while remaining:
+        wave = sorted(path for path, dependencies in remaining.items() if not dependencies)
+        if not wave:
+            waves.append(sorted(remaining))
+            break
+        waves.append(wave)
+        for path in wave:
+            del remaining[path]
+        for dependencies in remaining.values():
+            dependencies.difference_update(wave)
+    return waves
+
+
+def dependency_context(project_file, results):
+    """Converted public signatures of a file's dependencies, for its prompt"""
+    sections = []
+    for path in sorted(project_file.dependencies):
+        result = results.get(path)
+        if result is not None and result.ok and result.signatures:
+            sections.append("\n".join([f"// {result.output_name}"] + result.signatures))
+    return "\n\n".join(sections)
+
+
+def _checkpoint_key(project_file, target_lang, context, settings):
+    fields = [project_file.code, project_file.source_lang, target_lang, context, settings]
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()
+
+
+def load_checkpoint(path):
+    """Checkpointed successful conversions by file path; the last entry per file wins"""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line
+                continue
+            entries[entry["path"]] = entry
+    return entries
+
+
+def convert_project(files, target_lang, convert_fn, output_dir, max_workers=DEFAULT_BATCH_WORKERS,
+                    checkpoint_path=None, settings=""):
+    """Convert a project wave by wave, yielding a ProjectResult as each file finishes
+
+    convert_fn(code, source_lang, target_lang, context) converts one file; context
+    holds the converted signatures of its dependencies. Outputs are written under
+    output_dir as they finish and recorded in a JSON-lines checkpoint
+    (output_dir/CHECKPOINT_FILE by default). A rerun reuses checkpointed files whose
+    code, dependency context and settings are unchanged, so an interrupted run resumes.
+    """
+    checkpoint_path = checkpoint_path or os.path.join(output_dir, CHECKPOINT_FILE)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = load_checkpoint(checkpoint_path)
+    outputs = output_names(list(files), target_lang)
+    results = {}
+    lock = threading.Lock()
+
+    def convert_file(project_file, wave):
+        context = dependency_context(project_file, results)
+        key = _checkpoint_key(project_file, target_lang, context, settings)
+        entry = checkpoint.get(project_file.path)
+        result = ProjectResult(
+            project_file.path, project_file.source_lang, target_lang, wave=wave, output_file=outputs[project_file.path]
+        )
+        if entry is not None and entry["key"] == key:
+            result.output, result.signatures, result.resumed = entry["output"], entry["signatures"], True
+            return result
+        try:
+            output = strip_code_fences(convert_fn(project_file.code, project_file.source_lang, target_lang, context))
+        except Exception as e:
+            result.error = str(e)
+            return result
+        result.output, result.signatures = output, extract_signatures(output, target_lang)
+        output_path = os.path.join(output_dir, *result.output_name.split("/"))
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        with lock, open(checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "path": project_file.path, "key": key, "output": output, "signatures": result.signatures
+            }) + "\n")
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for wave, paths in enumerate(conversion_waves(files)):
+            futures = [executor.submit(convert_file, files[path], wave) for path in paths]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.name] = result
+                yield result
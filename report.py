@@ -0,0 +1,194 @@
+import io
+import os
+import zipfile
+
+from analysis import CHARS_PER_TOKEN
+from batch import EXTENSION_LANGUAGES, SKIPPED_DIRECTORIES
+from chunking import DEFAULT_CHUNK_LINES
+from compaction import OUTPUT_EXPANSION
+from startup import lazy_import
+
+# Output tokens per second assumed until the metrics registry has measured the model
+DEFAULT_TOKENS_PER_SECOND = 100.0
+# Fixed latency per model call (connection, queueing, time to first token)
+DEFAULT_CALL_OVERHEAD = 1.0
+# Instructions wrapped around the code in every prompt
+PROMPT_OVERHEAD_TOKENS = 80
+
+# Bytes skipped by str.strip() at the start of a line, besides the line break itself
+WHITESPACE_BYTES = b" \t\r\x0b\x0c"
+# Leading bytes of a zip member checked for NUL bytes, which mark it as binary
+BINARY_SNIFF_BYTES = 8192
+
+REPORT_COLUMNS = [
+    "file", "language", "total_lines", "code_lines", "comment_lines", "blank_lines", "block_comments", "chars",
+    "input_tokens", "output_tokens", "calls", "projected_seconds"
+]
+
+
+def expand_uploads(files):
+    """Replace zip archives among (name, bytes) pairs by their source members, decoded as text
+
+    Only members with a known source extension are kept, and binary members are skipped.
+    """
+    for name, data in files:
+        if not name.lower().endswith(".zip"):
+            yield name, data.decode("utf-8", errors="replace")
+            continue
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for member in archive.infolist():
+                parts = member.filename.split("/")
+                if member.is_dir() or any(part in SKIPPED_DIRECTORIES or part.startswith('.') for part in parts[:-1]):
+                    continue
+                if os.path.splitext(member.filename)[1].lstrip('.').lower() not in EXTENSION_LANGUAGES:
+                    continue
+                content = archive.read(member)
+                if b"\0" in content[:BINARY_SNIFF_BYTES]:
+                    continue
+                yield member.filename, content.decode("utf-8", errors="replace")
+
+
+def _line_counts(codes):
+    """Line, blank, comment and block-comment counts per file, from one scan over all files
+
+    The files are joined into a single byte array and every line is classified at
+    once with numpy; the counts match analyze_code_complexity for ASCII whitespace.
+    As there, an empty file has no lines.
+    """
+    np = lazy_import("numpy")
+    if not codes:
+        return {column: np.zeros(0, dtype=np.int64) for column in ("total_lines", "blank_lines", "comment_lines", "block_comments")}
+    encoded = [code.encode("utf-8", errors="replace") for code in codes]
+    # Each file ends with an extra line break, so no line spans two files
+    data = np.frombuffer(b"\n".join(encoded) + b"\n", dtype=np.uint8)
+    sizes = np.fromiter((len(code) + 1 for code in encoded), dtype=np.int64, count=len(encoded))
+    file_starts = np.cumsum(sizes) - sizes
+
+    line_ends = np.flatnonzero(data == ord("\n"))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    line_files = np.searchsorted(file_starts, line_starts, side="right") - 1
+
+    # First byte of each line that str.strip() would keep; only indentation is stepped over
+    padding = np.zeros(256, dtype=bool)
+    padding[list(WHITESPACE_BYTES)] = True
+    first = line_starts.copy()
+    indented = np.flatnonzero(padding[data[first]])
+    while indented.size:
+        first[indented] += 1
+        indented = indented[padding[data[first[indented]]]]
+    blank = first == line_ends
+    lead = data[first]
+    following = data[np.minimum(first + 1, len(data) - 1)]
+    comment = ~blank & (
+        (lead == ord("#")) | (lead == ord("*"))
+        | ((lead == ord("/")) & ((following == ord("/")) | (following == ord("*"))))
+        | ((lead == ord("-")) & (following == ord("-")))
+    )
+
+    count = len(encoded)
+    # The joined line break of an empty file is not a line of it
+    not_empty = sizes[line_files] > 1
+    return {
+        "total_lines": np.bincount(line_files[not_empty], minlength=count),
+        "blank_lines": np.bincount(line_files[blank & not_empty], minlength=count),
+        "comment_lines": np.bincount(line_files[comment], minlength=count),
+        "block_comments": _block_comments(data, file_starts, file_starts + sizes - 1),
+    }
+
+
+def _block_comments(data, file_starts, file_ends):
+    """Closed block comments per file, paired left to right as analyze_code_complexity does
+
+    An opener inside an open comment is part of it, and a comment left open at the
+    end of its file is not counted.
+    """
+    np = lazy_import("numpy")
+    # The joined data ends in a line break, so the bytes after a '/', '*' or ']' always exist
+    slashes = np.flatnonzero(data == ord("/"))
+    stars = np.flatnonzero(data == ord("*"))
+    brackets = np.flatnonzero(data == ord("]"))
+    dashes = np.flatnonzero(data == ord("-"))
+    dashes = dashes[dashes + 3 < len(data)]
+    # (opener positions, opener length, closer positions, closer length) per BLOCK_COMMENT_DELIMITERS entry
+    delimiters = [
+        (slashes[data[slashes + 1] == ord("*")], 2, stars[data[stars + 1] == ord("/")], 2),
+        (
+            dashes[(data[dashes + 1] == ord("-")) & (data[dashes + 2] == ord("[")) & (data[dashes + 3] == ord("["))], 4,
+            brackets[data[brackets + 1] == ord("]")], 2
+        ),
+    ]
+    counts = np.zeros(len(file_starts), dtype=np.int64)
+    openers = np.concatenate([opener_positions for opener_positions, _, _, _ in delimiters])
+    # Only files containing an opener need the sequential pairing
+    for index in np.unique(np.searchsorted(file_starts, openers, side="right") - 1):
+        position, end = file_starts[index], file_ends[index]
+        while True:
+            found = []
+            for opener_positions, opener_length, closer_positions, closer_length in delimiters:
+                next_opener = np.searchsorted(opener_positions, position)
+                if next_opener < len(opener_positions) and opener_positions[next_opener] < end:
+                    found.append((opener_positions[next_opener] + opener_length, closer_positions, closer_length))
+            if not found:
+                break
+            after_opener, closer_positions, closer_length = min(found, key=lambda entry: entry[0])
+            closer = np.searchsorted(closer_positions, after_opener)
+            if closer >= len(closer_positions) or closer_positions[closer] >= end:
+                break
+            counts[index] += 1
+            position = closer_positions[closer] + closer_length
+    return counts
+
+
+def build_report(files, target_lang=None, detect_fn=None, tokens_per_second=None,
+                 call_overhead=DEFAULT_CALL_OVERHEAD, chunk_lines=DEFAULT_CHUNK_LINES):
+    """Per-file size, token and time estimates for (name, code) pairs, as a DataFrame
+
+    Counts come from one vectorized scan over all files instead of one
+    analyze_code_complexity() call per file. The language comes from the extension;
+    detect_fn is called only for files whose extension is not recognised. Files
+    already in target_lang, or in no known language, are projected to cost nothing.
+    """
+    pd = lazy_import("pandas")
+    names, codes = zip(*files) if files else ((), ())
+    code = pd.Series(codes, dtype="string")
+    frame = pd.DataFrame({"file": pd.Series(names, dtype="string")})
+
+    extensions = frame["file"].str.extract(r"\.([^./]+)$", expand=False).str.lower()
+    frame["language"] = extensions.map(EXTENSION_LANGUAGES).astype("string")
+    unknown = frame["language"].isna()
+    if detect_fn is not None and unknown.any():
+        frame.loc[unknown, "language"] = code[unknown].map(detect_fn)
+    frame["language"] = frame["language"].fillna("unknown")
+
+    for column, counts in _line_counts(codes).items():
+        frame[column] = counts
+    frame["code_lines"] = frame["total_lines"] - frame["blank_lines"] - frame["comment_lines"]
+    frame["chars"] = code.str.len()
+
+    converted = frame["language"].ne("unknown")
+    if target_lang:
+        converted &= frame["language"].ne(target_lang)
+    code_tokens = -(-frame["chars"] // CHARS_PER_TOKEN)
+    frame["calls"] = (-(-frame["total_lines"] // chunk_lines)).where(converted, 0)
+    frame["input_tokens"] = (code_tokens + frame["calls"] * PROMPT_OVERHEAD_TOKENS).where(converted, 0)
+    frame["output_tokens"] = (code_tokens * OUTPUT_EXPANSION).round().astype("int64").where(converted, 0)
+    rate = tokens_per_second or DEFAULT_TOKENS_PER_SECOND
+    frame["projected_seconds"] = frame["output_tokens"] / rate + frame["calls"] * call_overhead
+    return frame[REPORT_COLUMNS]
+
+
+def summarize_report(frame, workers=1):
+    """Totals per language, plus the projected wall time with workers conversions in parallel"""
+    summary = frame.groupby("language").agg(
+        files=("file", "size"),
+        total_lines=("total_lines", "sum"),
+        code_lines=("code_lines", "sum"),
+        comment_lines=("comment_lines", "sum"),
+        input_tokens=("input_tokens", "sum"),
+        output_tokens=("output_tokens", "sum"),
+        calls=("calls", "sum"),
+        projected_seconds=("projected_seconds", "sum"),
+    ).sort_values("input_tokens", ascending=False)
+    # Lower bound: the longest single file cannot be split across workers
+    wall_seconds = max(frame["projected_seconds"].sum() / max(workers, 1), frame["projected_seconds"].max() if len(frame) else 0.0)
+    return summary, float(wall_seconds)
@@ -0,0 +1,295 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass
+from typing import Optional
+
+from metrics import percentile
+
+# Errors that will fail the same way on every attempt
+NON_RETRYABLE_ERRORS = (ValueError, TypeError, KeyError, AttributeError, NotImplementedError)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the model while the circuit breaker is open"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a model call does not finish within its deadline"""
+
+
+@dataclass
+class ResiliencePolicy:
+    """Timeouts, retries, hedging and circuit breaking for model calls; times are in seconds"""
+    timeout: float = 120.0
+    deadline: float = 300.0
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+    hedge_delay: Optional[float] = None
+    breaker_failures: int = 5
+    breaker_reset: float = 30.0
+
+    @classmethod
+    def from_env(cls):
+        """Policy configured from MODEL_* environment variables"""
+        hedge_delay = os.getenv("MODEL_HEDGE_DELAY")
+        return cls(
+            timeout=float(os.getenv("MODEL_TIMEOUT", cls.timeout)),
+            deadline=float(os.getenv("MODEL_DEADLINE", cls.deadline)),
+            max_retries=int(os.getenv("MODEL_MAX_RETRIES", cls.max_retries)),
+            backoff_base=float(os.getenv("MODEL_BACKOFF_BASE", cls.backoff_base)),
+            backoff_max=float(os.getenv("MODEL_BACKOFF_MAX", cls.backoff_max)),
+            hedge=os.getenv("MODEL_HEDGE", "0").lower() in ("1", "true", "yes"),
+            hedge_delay=float(hedge_delay) if hedge_delay else None,
+            breaker_failures=int(os.getenv("MODEL_BREAKER_FAILURES", cls.breaker_failures)),
+            breaker_reset=float(os.getenv("MODEL_BREAKER_RESET", cls.breaker_reset)),
+        )
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single probe through once reset seconds have passed"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def record_success(self):
+        with self._lock:
+            self._failures, self._opened_at, self._probing = 0, None, False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at, self._probing = time.monotonic(), False
+
+
+def _spawn(fn):
+    """Run fn in a daemon thread and return a Future for it
+
+    A call that misses its deadline cannot be interrupted; its thread is left to
+    finish in the background and its result is discarded.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+class ResilientCaller:
+    """Deadlines, jittered exponential backoff, optional hedging and a circuit breaker around model calls"""
+
+    def __init__(self, policy=None, latency_window=200):
+        self.policy = policy or ResiliencePolicy()
+        self.breaker = CircuitBreaker(self.policy.breaker_failures, self.policy.breaker_reset)
+        self._lock = threading.Lock()
+        # Full-call latencies, which the hedge delay is derived from
+        self._latencies = deque(maxlen=latency_window)
+        # Stream times to first chunk, much shorter than full calls and kept apart from them
+        self._first_chunk_latencies = deque(maxlen=latency_window)
+        self._counters = {
+            "calls": 0, "successes": 0, "failures": 0, "retries": 0,
+            "timeouts": 0, "hedges": 0, "hedge_wins": 0, "short_circuits": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def hedge_delay(self):
+        """Seconds to wait before firing a duplicate request, or None when hedging is off or unwarmed"""
+        if not self.policy.hedge:
+            return None
+        if self.policy.hedge_delay is not None:
+            return self.policy.hedge_delay
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < self.policy.hedge_min_samples:
+            return None
+        return percentile(latencies, self.policy.hedge_quantile)
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self._count("short_circuits")
+            raise CircuitOpenError(
+                f"Model calls are failing; paused for {self.breaker.retry_after():.1f}s before trying again"
+            )
+
+    def _backoff(self, attempt, deadline_at):
+        """Sleep with full jitter before the next attempt; returns False if the deadline would pass"""
+        delay = random.uniform(0, min(self.policy.backoff_max, self.policy.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline_at:
+            return False
+        time.sleep(delay)
+        self._count("retries")
+        return True
+
+    def _attempt(self, fn, timeout):
+        """One attempt, hedged with a duplicate request if the first is slower than the hedge delay"""
+        start = time.monotonic()
+        primary = _spawn(fn)
+        pending = [primary]
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                self._count("hedges")
+                pending.append(_spawn(fn))
+
+        error = None
+        while pending:
+            remaining = timeout - (time.monotonic() - start)
+            done, _ = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                self._count("timeouts")
+                raise DeadlineExceeded(f"Model call timed out after {timeout:.1f}s")
+            for future in done:
+                pending.remove(future)
+                if future.exception() is not None:
+                    # The other request of a hedged pair may still succeed
+                    error = future.exception()
+                    continue
+                if future is not primary:
+                    self._count("hedge_wins")
+                with self._lock:
+                    self._latencies.append(time.monotonic() - start)
+                return future.result()
+        raise error
+
+    def call(self, fn):
+        """Call fn under the policy, retrying retryable errors until the deadline"""
+        self._count("calls")
+        deadline_at = time.monotonic() + self.policy.deadline
+        attempt = 0
+        while True:
+            self._check_breaker()
+            timeout = min(self.policy.timeout, deadline_at - time.monotonic())
+            try:
+                result = self._attempt(fn, timeout)
+            except Exception as e:
+                self.breaker.record_failure()
+                if (
+                    isinstance(e, NON_RETRYABLE_ERRORS) or attempt >= self.policy.max_retries
+                    or not self._backoff(attempt, deadline_at)
+                ):
+                    self._count("failures")
+                    raise
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return result
+
+    def stream(self, fn):
+        """Iterate fn() under the policy
+
+        Deadlines and retries apply until the first chunk arrives; once output has
+        been yielded the stream is not restarted. Streams are not hedged.
+        """
+        self._count("calls")
+        deadline_at = time.monotonic() + self.policy.deadline
+        attempt = 0
+        while True:
+            self._check_breaker()
+            timeout = min(self.policy.timeout, deadline_at - time.monotonic())
+            start = time.monotonic()
+            try:
+                future = _spawn(lambda: self._first_chunk(fn))
+                done, _ = wait([future], timeout=max(timeout, 0))
+                if not done:
+                    self._count("timeouts")
+                    raise DeadlineExceeded(f"Model call timed out after {timeout:.1f}s")
+                chunks, first = future.result()
+            except Exception as e:
+                self.breaker.record_failure()
+                if (
+                    isinstance(e, NON_RETRYABLE_ERRORS) or attempt >= self.policy.max_retries
+                    or not self._backoff(attempt, deadline_at)
+                ):
+                    self._count("failures")
+                    raise
+                attempt += 1
+                continue
+            break
+
+        with self._lock:
+            self._first_chunk_latencies.append(time.monotonic() - start)
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+        except GeneratorExit:
+            # The consumer stopped reading, e.g. after the closing code fence; the backend did respond
+            self.breaker.record_success()
+            self._count("successes")
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            self._count("failures")
+            raise
+        self.breaker.record_success()
+        self._count("successes")
+
+    @staticmethod
+    def _first_chunk(fn):
+        chunks = iter(fn())
+        return chunks, next(chunks, None)
+
+    def stats(self):
+        """Counters, breaker state and recent call and stream first-chunk latency percentiles"""
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = list(self._latencies)
+            first_chunk_latencies = list(self._first_chunk_latencies)
+        return {
+            **counters,
+            "breaker": self.breaker.state,
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "first_chunk_p50": percentile(first_chunk_latencies, 0.5),
+            "first_chunk_p95": percentile(first_chunk_latencies, 0.95),
+        }
@@ -0,0 +1,238 @@
+import random
+import threading
+import time
+
+from resilience import CircuitOpenError, NON_RETRYABLE_ERRORS, ResilientCaller, ResiliencePolicy
+
+DEFAULT_EWMA_ALPHA = 0.2
+# Per-request overhead, in prompt tokens, so small requests are not predicted to be free
+LATENCY_BASE_TOKENS = 500
+# Floor on the success rate when penalizing a failing backend, so its score stays finite
+MIN_SUCCESS_RATE = 0.05
+# Latency prior for backends without a successful request while no backend has one either
+DEFAULT_SECONDS_PER_TOKEN = 0.002
+# Seconds for a backend's error rate to halve without new requests, so a penalized backend recovers
+DEFAULT_ERROR_HALF_LIFE = 30.0
+# Floor on scores when weighting the random choice, so instant backends keep a finite weight
+MIN_SCORE = 1e-6
+
+
+class Backend:
+    """One model endpoint (model, key, region...) with its own resilience policy and live estimates
+
+    Requests with between min_input_tokens and max_input_tokens prompt tokens are
+    routed here. Latency is tracked as an EWMA of seconds per prompt token, so
+    backends serving different request sizes can be compared. The error rate is an
+    EWMA too, which also halves every error_half_life seconds.
+    """
+
+    def __init__(
+        self, name, model, min_input_tokens=0, max_input_tokens=None, policy=None, alpha=DEFAULT_EWMA_ALPHA,
+        error_half_life=DEFAULT_ERROR_HALF_LIFE
+    ):
+        self.name = name
+        self.model = model
+        self.min_input_tokens = min_input_tokens
+        self.max_input_tokens = max_input_tokens
+        self.alpha = alpha
+        self.error_half_life = error_half_life
+        self.caller = ResilientCaller(policy or ResiliencePolicy.from_env())
+        self._lock = threading.Lock()
+        self.seconds_per_token = None
+        self._error_rate = 0.0
+        self._error_updated = time.monotonic()
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+    def accepts(self, input_tokens):
+        return input_tokens >= self.min_input_tokens and (
+            self.max_input_tokens is None or input_tokens <= self.max_input_tokens
+        )
+
+    def _decayed_error_rate(self, now):
+        return self._error_rate * 0.5 ** ((now - self._error_updated) / self.error_half_life)
+
+    @property
+    def error_rate(self):
+        """Recent error rate, decayed for the time since the last request finished"""
+        with self._lock:
+            return self._decayed_error_rate(time.monotonic())
+
+    def score(self, input_tokens, prior=DEFAULT_SECONDS_PER_TOKEN):
+        """Expected latency for a request of this size, inflated by load and recent errors; lower is better
+
+        A backend without a successful request yet is assumed to take prior seconds per
+        token, so failures still lower its rank.
+        """
+        with self._lock:
+            rate = self.seconds_per_token if self.seconds_per_token is not None else prior
+            expected = rate * (input_tokens + LATENCY_BASE_TOKENS)
+            error_rate = self._decayed_error_rate(time.monotonic())
+            return expected * (1 + self.in_flight) / max(1 - error_rate, MIN_SUCCESS_RATE)
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def finish(self, seconds, input_tokens, ok):
+        """Fold one finished request into the latency and error EWMAs"""
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            error_rate = self._decayed_error_rate(now)
+            self._error_rate = error_rate + self.alpha * ((0.0 if ok else 1.0) - error_rate)
+            self._error_updated = now
+            if not ok:
+                self.failures += 1
+                return
+            rate = seconds / (input_tokens + LATENCY_BASE_TOKENS)
+            if self.seconds_per_token is None:
+                self.seconds_per_token = rate
+            else:
+                self.seconds_per_token += self.alpha * (rate - self.seconds_per_token)
+
+    def abandon(self):
+        """Release a request that never reached the model, e.g. short-circuited by the breaker"""
+        with self._lock:
+            self.in_flight -= 1
+            self.requests -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "requests": self.requests,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "error_rate": self._decayed_error_rate(time.monotonic()),
+                "seconds_per_1k_tokens": (self.seconds_per_token or 0.0) * 1000,
+                "breaker": self.caller.breaker.state,
+            }
+
+
+class ModelRouter:
+    """Routes each model call to a backend suited to its size, failing over to the next on errors
+
+    Backends whose size range excludes a request are skipped unless none accepts it;
+    the engine's token budget remains the hard limit. Open circuit breakers sort last.
+    """
+
+    def __init__(self, backends):
+        if not backends:
+            raise ValueError("ModelRouter needs at least one backend")
+        self.backends = list(backends)
+        self._lock = threading.Lock()
+        self._failovers = 0
+
+    def model_names(self):
+        """Distinct names of the backends' models, sorted; a model without a name counts as its class"""
+        return sorted({getattr(backend.model, "model", None) or type(backend.model).__name__ for backend in self.backends})
+
+    def candidates(self, input_tokens):
+        """Backends to try for a request: one picked at random, then the rest best first
+
+        The first backend is drawn from those with a closed or half-open breaker,
+        weighted by the inverse of their scores. Faster, healthier backends get more
+        requests without all of them herding onto the current best, and a penalized
+        backend still sees the occasional request that shows it has recovered.
+        """
+        backends = [backend for backend in self.backends if backend.accepts(input_tokens)] or self.backends
+        # Unsampled backends are assumed to be as fast as the sampled ones on average
+        sampled = [backend.seconds_per_token for backend in self.backends if backend.seconds_per_token is not None]
+        prior = sum(sampled) / len(sampled) if sampled else DEFAULT_SECONDS_PER_TOKEN
+        scores = {backend: backend.score(input_tokens, prior) for backend in backends}
+        ranked = sorted(backends, key=lambda backend: (backend.caller.breaker.state == "open", scores[backend]))
+        healthy = [backend for backend in ranked if backend.caller.breaker.state != "open"]
+        if len(healthy) > 1:
+            first = random.choices(healthy, weights=[1 / max(scores[backend], MIN_SCORE) for backend in healthy])[0]
+            ranked.remove(first)
+            ranked.insert(0, first)
+        return ranked
+
+    def _failed_over(self):
+        with self._lock:
+            self._failovers += 1
+
+    def invoke(self, prompt, input_tokens):
+        """Invoke the best backend's model on prompt, failing over while backends remain"""
+        error = None
+        for backend in self.candidates(input_tokens):
+            if error is not None:
+                self._failed_over()
+            backend.begin()
+            start = time.monotonic()
+            try:
+                message = backend.caller.call(lambda: backend.model.invoke(prompt))
+            except CircuitOpenError as e:
+                backend.abandon()
+                error = e
+                continue
+            except NON_RETRYABLE_ERRORS:
+                # A malformed request fails the same way everywhere
+                backend.finish(time.monotonic() - start, input_tokens, ok=False)
+                raise
+            except Exception as e:
+                backend.finish(time.monotonic() - start, input_tokens, ok=False)
+                error = e
+                continue
+            backend.finish(time.monotonic() - start, input_tokens, ok=True)
+            return message
+        raise error
+
+    def stream(self, prompt, input_tokens):
+        """Stream from the best backend; failover happens only until the first chunk arrives"""
+        error = None
+        for backend in self.candidates(input_tokens):
+            if error is not None:
+                self._failed_over()
+            backend.begin()
+            start = time.monotonic()
+            chunks = backend.caller.stream(lambda: backend.model.stream(prompt))
+            try:
+                first = next(chunks, None)
+            except CircuitOpenError as e:
+                backend.abandon()
+                error = e
+                continue
+            except NON_RETRYABLE_ERRORS:
+                backend.finish(time.monotonic() - start, input_tokens, ok=False)
+                raise
+            except Exception as e:
+                backend.finish(time.monotonic() - start, input_tokens, ok=False)
+                error = e
+                continue
+            yield from self._rest(backend, chunks, first, start, input_tokens)
+            return
+        raise error
+
+    @staticmethod
+    def _rest(backend, chunks, first, start, input_tokens):
+        ok = False
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+            ok = True
+        except GeneratorExit:
+            # The consumer stopped reading after the code block; the backend did respond
+            chunks.close()
+            ok = True
+            raise
+        finally:
+            backend.finish(time.monotonic() - start, input_tokens, ok=ok)
+
+    def stats(self):
+        """Per-backend estimates plus router-wide totals summed over the backends' callers"""
+        backends = [backend.stats() for backend in self.backends]
+        totals = {}
+        for backend in self.backends:
+            for name, value in backend.caller.stats().items():
+                if isinstance(value, int):
+                    totals[name] = totals.get(name, 0) + value
+        with self._lock:
+            totals["failovers"] = self._failovers
+        breakers = {stats["breaker"] for stats in backends}
+        totals["breaker"] = breakers.pop() if len(breakers) == 1 else "mixed"
+        return {**totals, "backends": backends}
@@ -0,0 +1,77 @@
+import threading
+
+
+class _Call:
+    """One in-flight call and the outcome its followers wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+        self.followers = 0
+
+
+class SingleFlight:
+    """Process-wide coalescing of identical concurrent calls
+
+    The first caller for a key runs the call; callers arriving while it is in flight
+    wait for it and share its result or exception. If the leader gives up without an
+    outcome (e.g. an abandoned stream), one of the waiters runs the call instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {"leaders": 0, "coalesced": 0}
+
+    def begin(self, key):
+        """Join the in-flight call for key, or start one; returns (call, is_leader)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self._counters["coalesced"] += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self._counters["leaders"] += 1
+            return call, True
+
+    def finish(self, key, call, result=None, error=None, abandoned=False):
+        """Publish the leader's outcome and wake the followers"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result, call.error, call.abandoned = result, error, abandoned
+        call.done.set()
+
+    def wait(self, call):
+        """Block until the leader finishes; returns its result, or raises its exception"""
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn):
+        """Run fn once for all concurrent callers with the same key; returns (result, was_coalesced)"""
+        while True:
+            call, leader = self.begin(key)
+            if not leader:
+                result = self.wait(call)
+                if call.abandoned:
+                    continue
+                return result, True
+            try:
+                result = fn()
+            except Exception as e:
+                self.finish(key, call, error=e)
+                raise
+            except BaseException:
+                self.finish(key, call, abandoned=True)
+                raise
+            self.finish(key, call, result)
+            return result, False
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._calls)}
@@ -0,0 +1,74 @@
+"""Cold-start instrumentation: timed lazy imports and an import-time report.
+
+    python startup.py           # cold import time of each heavy dependency
+    python startup.py --json
+"""
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+
+# Reference point for startup events; this module is the first thing app.py imports
+STARTUP_MARK = time.perf_counter()
+
+HEAVY_MODULES = ("streamlit", "langchain_core.prompts", "langchain_google_genai", "pandas", "pyperclip", "dotenv")
+
+_import_times = {}
+_events = {}
+
+
+def lazy_import(name):
+    """Import a module on first use, recording how long the import took"""
+    module = sys.modules.get(name)
+    # A module another thread is still importing is in sys.modules too; import_module waits for it
+    if module is not None and not getattr(getattr(module, "__spec__", None), "_initializing", False):
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_times[name] = time.perf_counter() - start
+    return module
+
+
+def mark(event):
+    """Record the first time an event happens, in seconds since startup"""
+    _events.setdefault(event, time.perf_counter() - STARTUP_MARK)
+
+
+def import_report():
+    """Lazy import durations and startup events recorded in this process"""
+    return {"imports": dict(_import_times), "events": dict(_events)}
+
+
+def measure_cold_imports(modules=HEAVY_MODULES):
+    """Import each module in a fresh interpreter and return its cold import time in seconds"""
+    script = (
+        "import importlib, sys, time\n"
+        "start = time.perf_counter()\n"
+        "importlib.import_module(sys.argv[1])\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    times = {}
+    for name in modules:
+        completed = subprocess.run([sys.executable, "-c", script, name], capture_output=True, text=True)
+        times[name] = float(completed.stdout) if completed.returncode == 0 else None
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report cold import times of the app's dependencies.")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    times = measure_cold_imports()
+    if args.json:
+        print(json.dumps(times, indent=2))
+        return 0
+    for name, seconds in times.items():
+        print(f"{name:30} {'not installed' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+# Quick-start samples offered in the UI, keyed by source language
+CODE_TEMPLATES = {
+    "python": """def fibonacci(n):
+    # Calculate Fibonacci sequence
+    if n <= 1:
+        return n
+    else:
+        return fibonacci(n-1) + fibonacci(n-2)
+
+# Test the function
+for i in range(10):
+    print(f"Fibonacci({i}) = {fibonacci(i)}")""",
+    
+    "javascript": """function factorial(n) {
+    // Calculate factorial recursively
+    if (n === 0 || n === 1) {
+        return 1;
+    }
+    return n * factorial(n - 1);
+}
+
+// Test the function
+for (let i = 0; i < 10; i++) {
+    console.log(`Factorial(${i}) = ${factorial(i)}`);
+}""",
+    
+    "java": """public class Calculator {
+    public static int add(int a, int b) {
+        return a + b;
+    }
+    
+    public static void main(String[] args) {
+        // Test addition
+        int result = add(5, 3);
+        System.out.println("5 + 3 = " + result);
+    }
+}"""
+}
@@ -0,0 +1,137 @@
+"""Pretranslated conversions of the built-in templates, served without calling the model.
+
+    python translation_pack.py                       # build with CONVERTER_MODEL
+    python translation_pack.py --fake --output /tmp/pack.json.gz
+
+The pack is gzipped JSON mapping conversion cache keys to outputs. It records a format
+version and a fingerprint of the conversion prompt and output pipeline; a pack built for
+another version, prompt or pipeline is ignored at load time rather than serving stale
+translations. Packs built with --fake are test artifacts: they must be written to an
+explicit --output and are never loaded.
+"""
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from batch import FILE_EXTENSIONS
+from engine import CONVERSION_PROMPT, DEFAULT_MODEL, OUTPUT_PIPELINE_VERSION, OPTIMIZATION_LEVELS, ConversionEngine, ConversionOptions, create_model
+from templates import CODE_TEMPLATES
+
+PACK_VERSION = 1
+DEFAULT_PACK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "translation_pack.json.gz")
+DEFAULT_PACK_WORKERS = 8
+# Model name recorded in packs built with the offline fake model
+FAKE_MODEL_NAME = "fake"
+
+
+def prompt_fingerprint():
+    """Hash of the conversion prompt and output pipeline; translations made with others are not reused"""
+    fingerprint = f"{CONVERSION_PROMPT.template}\npipeline {OUTPUT_PIPELINE_VERSION}"
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+
+def all_options():
+    """Every combination of optimization level, comment and error handling options"""
+    return [
+        ConversionOptions(level, comments, error_handling)
+        for level, comments, error_handling in itertools.product(OPTIMIZATION_LEVELS, (True, False), (False, True))
+    ]
+
+
+def build_pack(engine, templates=CODE_TEMPLATES, targets=tuple(FILE_EXTENSIONS), max_workers=DEFAULT_PACK_WORKERS,
+               on_progress=None):
+    """Convert every template into every other target with every option combination
+
+    Returns a dict of cache key to output. on_progress(done, total) is called as
+    conversions finish; a failed conversion raises.
+    """
+    jobs = [
+        (code, source_lang, target_lang, options)
+        for source_lang, code in templates.items()
+        for target_lang in targets if target_lang != source_lang
+        for options in all_options()
+    ]
+    entries = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(engine.run, *job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            entries[engine.cache_key(*futures[future])] = future.result()
+            if on_progress:
+                on_progress(done, len(jobs))
+    return entries
+
+
+def write_pack(entries, path=DEFAULT_PACK_PATH, model_name=None):
+    """Atomically write a pack artifact"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    artifact = {
+        "version": PACK_VERSION,
+        "prompt": prompt_fingerprint(),
+        "model": model_name,
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "entries": entries,
+    }
+    temporary = f"{path}.tmp"
+    with gzip.open(temporary, "wt", encoding="utf-8") as f:
+        json.dump(artifact, f, separators=(",", ":"), sort_keys=True)
+    os.replace(temporary, path)
+
+
+def load_pack(path=None):
+    """Load pack entries, or an empty dict if the pack is missing, fake or built for another version or prompt"""
+    path = path or os.getenv("TRANSLATION_PACK", DEFAULT_PACK_PATH)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if artifact.get("version") != PACK_VERSION or artifact.get("prompt") != prompt_fingerprint():
+        return {}
+    if artifact.get("model") == FAKE_MODEL_NAME:
+        return {}
+    return artifact.get("entries", {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pretranslate the built-in templates into every language.")
+    parser.add_argument("--output", help="pack file to write (defaults to TRANSLATION_PACK or the bundled pack)")
+    parser.add_argument("--model", help="model name (defaults to CONVERTER_MODEL or gemini-2.5-flash)")
+    parser.add_argument("--fake", action="store_true", help="use the offline fake model, for testing the build")
+    parser.add_argument("--workers", type=int, default=DEFAULT_PACK_WORKERS, help="number of concurrent conversions")
+    args = parser.parse_args(argv)
+    if args.fake and not args.output:
+        # Never let fake translations replace the pack the app serves
+        parser.error("--fake requires --output")
+    args.output = args.output or os.getenv("TRANSLATION_PACK", DEFAULT_PACK_PATH)
+    load_dotenv()
+
+    if args.fake:
+        from fake_llm import FakeChatModel
+        model, model_name = FakeChatModel(), FAKE_MODEL_NAME
+    else:
+        model = create_model(args.model)
+        model_name = args.model or os.getenv("CONVERTER_MODEL", DEFAULT_MODEL)
+    engine = ConversionEngine(model=model)
+
+    def report(done, total):
+        print(f"\r{done}/{total} conversions", end="", file=sys.stderr, flush=True)
+
+    entries = build_pack(engine, max_workers=args.workers, on_progress=report)
+    print(file=sys.stderr)
+    write_pack(entries, args.output, model_name)
+    print(f"Wrote {len(entries)} translations to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())